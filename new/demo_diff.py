@@ -69,29 +69,20 @@ current_entries = [
 
 def compute_diff(current, previous):
     """Same algorithm as in scraper.py"""
-    current_by_id = {e['id']: e for e in current}
     previous_by_id = {e['id']: e for e in previous}
 
-    current_ids = set(current_by_id.keys())
-    previous_ids = set(previous_by_id.keys())
-
-    # New entries
-    new_ids = current_ids - previous_ids
-    new_entries = [current_by_id[eid] for eid in new_ids]
-
-    # Deleted entries
-    deleted_ids = previous_ids - current_ids
-    deleted_entries = [previous_by_id[eid] for eid in deleted_ids]
-
-    # Edited entries
-    common_ids = current_ids & previous_ids
+    new_entries = []
     edited_entries = []
+    current_ids = set()
 
-    for eid in common_ids:
-        curr = current_by_id[eid]
-        prev = previous_by_id[eid]
+    for curr in current:
+        eid = curr['id']
+        current_ids.add(eid)
+        prev = previous_by_id.get(eid)
 
-        if curr['content'] != prev['content'] or curr['timestamp'] != prev['timestamp']:
+        if prev is None:
+            new_entries.append(curr)
+        elif curr['content'] != prev['content'] or curr['timestamp'] != prev['timestamp']:
             edited_entries.append({
                 'id': eid,
                 'author': curr['author'],
@@ -106,6 +97,9 @@ def compute_diff(current, previous):
                 'scraped_at': curr['scraped_at']
             })
 
+    # Deleted entries
+    deleted_entries = [prev for eid, prev in previous_by_id.items() if eid not in current_ids]
+
     return {
         'new': new_entries,
         'edited': edited_entries,
@@ -3,22 +3,54 @@
 Production-hardened Eksi Sozluk scraper with diff tracking.
 Built for critical infrastructure - lives depend on reliability.
 
-Usage: python scraper.py <url> [--output <file>] [--state <file>] [--diff-only]
+Usage: python scraper.py <url> [--output <file>] [--state <file>] [--diff-only] [--durable]
 """
 
 import sys
 import json
 import os
+import re
+import html as html_lib
 import time
+import errno
 import hashlib
 import fcntl
+import shutil
+import threading
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set, TypedDict
 from pathlib import Path
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+    HAS_LXML = True
+except ImportError:
+    from bs4 import BeautifulSoup, SoupStrainer
+    HAS_LXML = False
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
 
 
 # ============================================================================
@@ -29,6 +61,67 @@ MAX_RETRIES = 3
 RETRY_BACKOFF_BASE = 2  # Exponential backoff: 2^retry_count seconds
 REQUEST_TIMEOUT = 20
 STATE_BACKUP_COUNT = 5  # Keep last 5 state backups
+BACKUP_ZSTD_LEVEL = 3  # Backups are zstd-compressed when zstandard is installed
+MAX_CONCURRENT_PAGES = 8  # Parallel page fetches (also the connection pool size)
+
+
+# ============================================================================
+# Precompiled Selectors (lxml fast path)
+# ============================================================================
+
+def _has_class(name: str) -> str:
+    """XPath predicate matching a single token in the class attribute."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Regex fast path over raw HTML (entry markup on eksisozluk is highly regular)
+_ENTRY_LIST_MARKER = 'id="entry-item-list"'
+_ENTRY_START_RE = re.compile(r'<li\b[^>]*\bdata-id="[^"]*"[^>]*>')
+_ATTR_RE = re.compile(r'([\w:-]+)="([^"]*)"')
+_CONTENT_RE = re.compile(r'<div\b[^>]*\bclass="content(?: [^"]*)?"[^>]*>(.*?)</div>', re.DOTALL)
+_DATE_RE = re.compile(r'<a\b[^>]*\bclass="entry-date(?: [^"]*)?"[^>]*>(.*?)</a>', re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]*>')
+_IRREGULAR_MARKUP = ('<div', '<!--', '<script', '<style', '<![CDATA[')
+
+if HAS_LXML:
+    _PAGER_XPATH = etree.XPath(f"//div[{_has_class('pager')}]/@data-pagecount")
+    _ENTRY_XPATH = etree.XPath("(//ul[@id='entry-item-list'])[1]//li[@data-id]")
+    _CONTENT_XPATH = etree.XPath(f".//div[{_has_class('content')}]")
+    _DATE_XPATH = etree.XPath(f".//a[{_has_class('entry-date')}]")
+else:
+    # html.parser fallback: build only the entry list subtree when that's all we need
+    _ENTRY_LIST_STRAINER = SoupStrainer('ul', attrs={'id': 'entry-item-list'})
+
+# lxml parsers must not be shared across threads, so each fetch thread keeps its own
+_PARSER_LOCAL = threading.local()
+
+
+def _get_lxml_parser():
+    """Return this thread's reusable lxml HTML parser."""
+    parser = getattr(_PARSER_LOCAL, 'parser', None)
+    if parser is None:
+        # Comments and whitespace-only text never reach extracted fields; id
+        # collection is only needed for getElementById-style lookups
+        parser = lxml_html.HTMLParser(collect_ids=False, remove_comments=True, remove_blank_text=True)
+        _PARSER_LOCAL.parser = parser
+    return parser
+
+
+# ============================================================================
+# Entry Type
+# ============================================================================
+
+class _EntryFields(TypedDict):
+    id: str
+    author: str
+    timestamp: str
+    content: str
+    scraped_at: str
+
+
+class Entry(_EntryFields, total=False):
+    """A scraped entry. Plain dict at runtime; '_h' is absent in old state files."""
+    _h: str
 
 
 # ============================================================================
@@ -69,17 +162,126 @@ def acquire_lock(lock_file: str):
                 print(f"Warning: Error releasing lock: {e}", file=sys.stderr)
 
 
+# ============================================================================
+# JSON Encoding (orjson fast path)
+# ============================================================================
+
+def dump_json_bytes(data) -> bytes:
+    """Serialize data as 2-space indented UTF-8 JSON."""
+    if HAS_ORJSON:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def load_json_bytes(raw: bytes):
+    """Deserialize UTF-8 JSON bytes."""
+    if HAS_ORJSON:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+# ============================================================================
+# State Encoding (msgpack with JSON fallback)
+# ============================================================================
+
+STATE_MSGPACK_MAGIC = b'MSG1'
+
+
+def encode_state_bytes(entries: List[Dict]) -> bytes:
+    """Encode state entries: magic-prefixed msgpack if available, else JSON."""
+    if HAS_MSGPACK:
+        return STATE_MSGPACK_MAGIC + msgpack.packb(entries, use_bin_type=True)
+    return dump_json_bytes(entries)
+
+
+def decode_state_bytes(raw: bytes):
+    """Decode a state file written by encode_state_bytes (msgpack or legacy JSON)."""
+    if raw.startswith(STATE_MSGPACK_MAGIC):
+        if not HAS_MSGPACK:
+            raise ValueError("state file is msgpack-encoded but msgpack is not installed")
+        return msgpack.unpackb(raw[len(STATE_MSGPACK_MAGIC):], raw=False)
+    return load_json_bytes(raw)
+
+
+# ============================================================================
+# HTTP Session (Connection Pooling / Keep-Alive)
+# ============================================================================
+
+def create_session() -> requests.Session:
+    """Create a session whose connection pool is shared by all page fetches."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=MAX_CONCURRENT_PAGES, pool_maxsize=MAX_CONCURRENT_PAGES)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_SESSION = create_session()
+
+
+# ============================================================================
+# HTTP Cache (Conditional GET)
+# ============================================================================
+
+def load_http_cache(cache_file: str) -> Dict[str, Dict]:
+    """Load per-URL validators (ETag / Last-Modified) and the IDs of the entries they produced."""
+    if not Path(cache_file).exists():
+        return {}
+
+    try:
+        with open(cache_file, 'rb') as f:
+            cache = load_json_bytes(f.read())
+        return cache if isinstance(cache, dict) else {}
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable HTTP cache {cache_file}: {e}", file=sys.stderr)
+        return {}
+
+
+def save_http_cache(cache: Dict[str, Dict], cache_file: str) -> bool:
+    """Save the HTTP cache atomically. Failure only costs full downloads next run."""
+    temp_file = f"{cache_file}.tmp.{os.getpid()}"
+    try:
+        with open(temp_file, 'wb') as f:
+            f.write(dump_json_bytes(cache))
+        os.replace(temp_file, cache_file)
+        return True
+    except Exception as e:
+        print(f"Warning: Failed to save HTTP cache: {e}", file=sys.stderr)
+        Path(temp_file).unlink(missing_ok=True)
+        return False
+
+
+def conditional_headers(headers: Dict[str, str], cached: Optional[Dict]) -> Dict[str, str]:
+    """Add If-None-Match / If-Modified-Since for a previously cached URL."""
+    if not cached:
+        return headers
+
+    conditional = dict(headers)
+    if cached.get('etag'):
+        conditional['If-None-Match'] = cached['etag']
+    if cached.get('last_modified'):
+        conditional['If-Modified-Since'] = cached['last_modified']
+    return conditional
+
+
+def cached_page_reusable(cached: Dict, previous_state: Optional[Dict[str, Entry]]) -> bool:
+    """True if every entry ID cached for a page is in the previous state, so a 304 can be served from it."""
+    ids = cached.get('ids')
+    return ids is not None and previous_state is not None and all(eid in previous_state for eid in ids)
+
+
 # ============================================================================
 # Pure Functions - Data Extraction with Retry Logic
 # ============================================================================
 
-def fetch_html_with_retry(url: str, headers: Dict[str, str], max_retries: int = MAX_RETRIES) -> Optional[str]:
-    """Fetch HTML with exponential backoff retry logic."""
+def fetch_response_with_retry(url: str, headers: Dict[str, str],
+                              max_retries: int = MAX_RETRIES) -> Optional[requests.Response]:
+    """Fetch a page with exponential backoff retry logic. 304 responses are returned as-is."""
     for attempt in range(max_retries):
         try:
-            response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+            response = _SESSION.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
-            return response.text
+            return response
 
         except requests.exceptions.RequestException as e:
             wait_time = RETRY_BACKOFF_BASE ** attempt
@@ -94,49 +296,152 @@ def fetch_html_with_retry(url: str, headers: Dict[str, str], max_retries: int =
     return None
 
 
-def parse_html(html: str) -> BeautifulSoup:
-    """Parse HTML string into BeautifulSoup object."""
+def fetch_html_with_retry(url: str, headers: Dict[str, str], max_retries: int = MAX_RETRIES) -> Optional[str]:
+    """Fetch HTML with exponential backoff retry logic."""
+    response = fetch_response_with_retry(url, headers, max_retries)
+    return response.text if response is not None else None
+
+
+def parse_html(html: str, entries_only: bool = False):
+    """
+    Parse HTML string into an lxml tree (or BeautifulSoup if lxml is unavailable).
+    entries_only lets the BeautifulSoup fallback skip everything but the entry list.
+    """
+    if HAS_LXML:
+        return lxml_html.fromstring(html, parser=_get_lxml_parser())
+    if entries_only:
+        return BeautifulSoup(html, 'html.parser', parse_only=_ENTRY_LIST_STRAINER)
     return BeautifulSoup(html, 'html.parser')
 
 
-def get_page_count(soup: BeautifulSoup) -> int:
+def get_page_count(soup) -> int:
     """Extract total page count from pagination."""
-    pager = soup.find('div', class_='pager')
-    if not pager or 'data-pagecount' not in pager.attrs:
-        return 1
+    if HAS_LXML:
+        values = _PAGER_XPATH(soup)
+        if not values:
+            return 1
+        page_count = values[0]
+    else:
+        pager = soup.find('div', class_='pager')
+        if not pager or 'data-pagecount' not in pager.attrs:
+            return 1
+        page_count = pager['data-pagecount']
+
     try:
-        return int(pager['data-pagecount'])
+        return int(page_count)
     except ValueError:
         return 1
 
 
-def extract_entry(entry_element) -> Optional[Dict]:
+def compute_entry_hash(content: str, timestamp: str) -> str:
+    """Short BLAKE2b digest of content + timestamp, used to skip unchanged entries in diffs."""
+    return hashlib.blake2b(f"{content}|{timestamp}".encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _element_text(element, separator: str = '') -> str:
+    """Join stripped, non-empty text nodes of an lxml element (like BeautifulSoup's get_text(strip=True))."""
+    return separator.join(t for t in (text.strip() for text in element.itertext()) if t)
+
+
+def build_entry(entry_id: str, author: str, timestamp: str, content: str) -> Entry:
+    """Build an entry dict from extracted fields."""
+    return {
+        'id': entry_id,
+        'author': sys.intern(author),  # authors repeat across a thread; share one str
+        'timestamp': timestamp,
+        'content': content,
+        'scraped_at': datetime.now().isoformat(),
+        '_h': compute_entry_hash(content, timestamp)
+    }
+
+
+def extract_entry(entry_element) -> Optional[Entry]:
     """Extract entry data from HTML element."""
     entry_id = entry_element.get('data-id')
     if not entry_id:
         return None
 
-    content_div = entry_element.find('div', class_='content')
-    date_link = entry_element.find('a', class_='entry-date')
+    if HAS_LXML:
+        content_divs = _CONTENT_XPATH(entry_element)
+        date_links = _DATE_XPATH(entry_element)
+        timestamp = _element_text(date_links[0]) if date_links else 'N/A'
+        content = _element_text(content_divs[0], separator='\n') if content_divs else 'N/A'
+    else:
+        content_div = entry_element.find('div', class_='content')
+        date_link = entry_element.find('a', class_='entry-date')
+        timestamp = date_link.get_text(strip=True) if date_link else 'N/A'
+        content = content_div.get_text(separator='\n', strip=True) if content_div else 'N/A'
 
-    return {
-        'id': entry_id,
-        'author': entry_element.get('data-author', 'N/A'),
-        'timestamp': date_link.get_text(strip=True) if date_link else 'N/A',
-        'content': content_div.get_text(separator='\n', strip=True) if content_div else 'N/A',
-        'scraped_at': datetime.now().isoformat()
-    }
+    return build_entry(entry_id, entry_element.get('data-author', 'N/A'), timestamp, content)
 
 
-def extract_entries_from_page(soup: BeautifulSoup) -> List[Dict]:
+def extract_entries_from_page(soup) -> List[Entry]:
     """Extract all entries from a single page."""
-    entry_list = soup.find('ul', id='entry-item-list')
-    if not entry_list:
-        return []
+    if HAS_LXML:
+        entry_elements = _ENTRY_XPATH(soup)
+    else:
+        entry_list = soup.find('ul', id='entry-item-list')
+        if not entry_list:
+            return []
+        entry_elements = entry_list.find_all('li', attrs={'data-id': True})
+
+    # Single pass: extract and drop ID-less elements without an intermediate list
+    return [e for e in map(extract_entry, entry_elements) if e is not None]
+
 
-    entry_elements = entry_list.find_all('li', attrs={'data-id': True})
-    entries = [extract_entry(elem) for elem in entry_elements]
-    return [e for e in entries if e is not None]
+def _fragment_text(fragment: str, separator: str = '') -> str:
+    """Text of an HTML fragment, joining stripped non-empty text nodes like _element_text."""
+    texts = (html_lib.unescape(text).strip() for text in _TAG_RE.split(fragment))
+    return separator.join(t for t in texts if t)
+
+
+def extract_entries_fast(html: str) -> Optional[List[Entry]]:
+    """
+    Extract entries with regexes over the raw HTML, skipping DOM construction.
+    Returns None if the markup isn't the expected regular shape, so callers can
+    fall back to the DOM parser.
+    """
+    list_start = html.find(_ENTRY_LIST_MARKER)
+    if list_start < 0:
+        return None
+
+    starts = list(_ENTRY_START_RE.finditer(html, list_start))
+    entries = []
+
+    for i, start in enumerate(starts):
+        attrs = {name: html_lib.unescape(value) for name, value in _ATTR_RE.findall(start.group(0))}
+        entry_id = attrs.get('data-id')
+        if not entry_id:
+            continue
+
+        segment_end = starts[i + 1].start() if i + 1 < len(starts) else len(html)
+        content_match = _CONTENT_RE.search(html, start.end(), segment_end)
+        if not content_match:
+            return None
+        date_match = _DATE_RE.search(html, content_match.end(), segment_end)
+        if not date_match:
+            return None
+
+        content_html = content_match.group(1)
+        if any(marker in content_html for marker in _IRREGULAR_MARKUP):
+            return None
+
+        entries.append(build_entry(
+            entry_id,
+            attrs.get('data-author', 'N/A'),
+            _fragment_text(date_match.group(1)),
+            _fragment_text(content_html, separator='\n')
+        ))
+
+    return entries
+
+
+def extract_entries_from_html(html: str) -> List[Entry]:
+    """Extract all entries from raw page HTML (regex fast path, DOM fallback)."""
+    entries = extract_entries_fast(html)
+    if entries is None:
+        entries = extract_entries_from_page(parse_html(html, entries_only=True))
+    return entries
 
 
 def build_page_urls(base_url: str, page_count: int) -> List[str]:
@@ -150,116 +455,180 @@ def build_page_urls(base_url: str, page_count: int) -> List[str]:
 # Data Validation
 # ============================================================================
 
+REQUIRED_FIELDS = ('id', 'author', 'timestamp', 'content', 'scraped_at')
+
+
 def validate_entry(entry: Dict) -> bool:
     """Validate that entry has required fields and proper structure."""
-    required_fields = ['id', 'author', 'timestamp', 'content', 'scraped_at']
+    entry_id = entry.get('id')
 
-    if not all(field in entry for field in required_fields):
+    # type() identity is cheaper than isinstance and entries only hold plain str
+    if type(entry_id) is not str or not entry_id:
         return False
 
-    if not isinstance(entry['id'], str) or not entry['id']:
+    if type(entry.get('content')) is not str:
         return False
 
-    if not isinstance(entry['content'], str):
-        return False
+    for field in REQUIRED_FIELDS:
+        if field not in entry:
+            return False
 
     return True
 
 
-def validate_entries(entries: List[Dict]) -> Tuple[List[Dict], List[str]]:
+def validate_entries(entries: List[Dict]) -> Tuple[List[Entry], List[str]]:
     """Validate all entries and return valid ones plus error list."""
-    valid_entries = []
+    valid_by_id = {}  # dict keeps insertion order and doubles as the dedup set
     errors = []
 
-    seen_ids = set()
-
     for entry in entries:
         if not validate_entry(entry):
             errors.append(f"Invalid entry structure: {entry.get('id', 'unknown')}")
             continue
 
-        # Check for duplicate IDs
-        if entry['id'] in seen_ids:
-            errors.append(f"Duplicate entry ID: {entry['id']}")
+        entry_id = entry['id']
+        if entry_id in valid_by_id:
+            errors.append(f"Duplicate entry ID: {entry_id}")
             continue
 
-        seen_ids.add(entry['id'])
-        valid_entries.append(entry)
+        valid_by_id[entry_id] = entry
 
-    return valid_entries, errors
+    return list(valid_by_id.values()), errors
 
 
 # ============================================================================
 # Atomic State Management with Backups
 # ============================================================================
 
-def load_state(state_file: str) -> Dict[str, Dict]:
+def index_state_entries(entries: List[Dict]) -> Dict[str, Entry]:
+    """Key valid loaded entries by ID, sharing one string object per author."""
+    state = {}
+    for entry in entries:
+        if validate_entry(entry):
+            author = entry['author']
+            if type(author) is str:
+                entry['author'] = sys.intern(author)
+            state[entry['id']] = entry
+    return state
+
+
+def load_state(state_file: str) -> Dict[str, Entry]:
     """Load previous scrape state from file. Returns dict keyed by entry ID."""
     if not Path(state_file).exists():
         return {}
 
     try:
-        with open(state_file, 'r', encoding='utf-8') as f:
-            entries = json.load(f)
+        with open(state_file, 'rb') as f:
+            entries = decode_state_bytes(f.read())
 
             # Validate structure
             if not isinstance(entries, list):
                 print(f"Warning: State file has invalid format, ignoring", file=sys.stderr)
                 return {}
 
-            return {entry['id']: entry for entry in entries if validate_entry(entry)}
+            return index_state_entries(entries)
     except Exception as e:
         print(f"Error loading state file: {e}", file=sys.stderr)
         # Try to load from backup
         return load_state_from_backup(state_file)
 
 
-def load_state_from_backup(state_file: str) -> Dict[str, Dict]:
-    """Try to load state from backup files."""
-    for i in range(1, STATE_BACKUP_COUNT + 1):
-        backup_file = f"{state_file}.backup.{i}"
-        if Path(backup_file).exists():
-            try:
-                print(f"Attempting to load from backup: {backup_file}", file=sys.stderr)
-                with open(backup_file, 'r', encoding='utf-8') as f:
-                    entries = json.load(f)
-                    if isinstance(entries, list):
-                        print(f"Successfully loaded from backup {i}", file=sys.stderr)
-                        return {entry['id']: entry for entry in entries if validate_entry(entry)}
-            except Exception as e:
-                print(f"Backup {i} also corrupted: {e}", file=sys.stderr)
-                continue
+def backup_index(backup_path: Path, state_name: str) -> Optional[int]:
+    """Parse the numeric suffix of `<state>.backup.<n>[.zst]`, or None if not a backup."""
+    suffix = backup_path.name[len(state_name) + len('.backup.'):]
+    if suffix.endswith('.zst'):
+        suffix = suffix[:-len('.zst')]
+    return int(suffix) if suffix.isdigit() else None
+
+
+def list_backups(state_file: str) -> List[Tuple[int, Path]]:
+    """List (index, path) of existing backups, oldest first."""
+    state_path = Path(state_file)
+    backups = []
+    for backup_path in state_path.parent.glob(f"{state_path.name}.backup.*"):
+        index = backup_index(backup_path, state_path.name)
+        if index is not None:
+            backups.append((index, backup_path))
+    backups.sort()
+    return backups
+
+
+def read_backup(backup_path: Path) -> bytes:
+    """Read a backup file, decompressing .zst backups."""
+    raw = backup_path.read_bytes()
+    if backup_path.suffix == '.zst':
+        return zstandard.ZstdDecompressor().decompress(raw)
+    return raw
+
+
+def load_state_from_backup(state_file: str) -> Dict[str, Entry]:
+    """Try to load state from backup files, newest first."""
+    for _, backup_file in reversed(list_backups(state_file)):
+        try:
+            print(f"Attempting to load from backup: {backup_file}", file=sys.stderr)
+            entries = decode_state_bytes(read_backup(backup_file))
+            if isinstance(entries, list):
+                print(f"Successfully loaded from backup {backup_file.name}", file=sys.stderr)
+                return index_state_entries(entries)
+        except Exception as e:
+            print(f"Backup {backup_file.name} also corrupted: {e}", file=sys.stderr)
+            continue
 
     print("All backups failed, starting fresh", file=sys.stderr)
     return {}
 
 
 def rotate_backups(state_file: str):
-    """Rotate backup files (keep last N versions)."""
+    """
+    Snapshot the current state as a new backup and prune old ones (keep last N).
+    Backups get monotonically increasing millisecond suffixes, so no renames are needed.
+    """
     state_path = Path(state_file)
 
     if not state_path.exists():
         return
 
-    # Rotate existing backups
-    for i in range(STATE_BACKUP_COUNT - 1, 0, -1):
-        old_backup = Path(f"{state_file}.backup.{i}")
-        new_backup = Path(f"{state_file}.backup.{i + 1}")
+    backups = list_backups(state_file)
+    index = int(time.time() * 1000)
+    if backups and backups[-1][0] >= index:
+        index = backups[-1][0] + 1
 
-        if old_backup.exists():
-            old_backup.rename(new_backup)
-
-    # Create new backup from current state
-    backup_path = Path(f"{state_file}.backup.1")
     try:
-        import shutil
-        shutil.copy2(state_path, backup_path)
+        if HAS_ZSTD:
+            # Compressed snapshot: the msgpack state (JSON without msgpack) still has the
+            # repetitive keys and Turkish text zstd compresses well
+            compressor = zstandard.ZstdCompressor(level=BACKUP_ZSTD_LEVEL)
+            backup_path = Path(f"{state_file}.backup.{index}.zst")
+            backup_path.write_bytes(compressor.compress(state_path.read_bytes()))
+        else:
+            # The state file is never modified in place (saves replace it with a
+            # new inode), so a hardlink is a safe snapshot.
+            backup_path = Path(f"{state_file}.backup.{index}")
+            try:
+                os.link(state_path, backup_path)
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                    raise
+                # Filesystem without hardlink support: fall back to a full copy
+                shutil.copy2(state_path, backup_path)
+        backups.append((index, backup_path))
     except Exception as e:
         print(f"Warning: Failed to create backup: {e}", file=sys.stderr)
 
+    # Prune the oldest backups beyond the retention count
+    for _, old_backup in backups[:-STATE_BACKUP_COUNT]:
+        try:
+            old_backup.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"Warning: Failed to prune backup {old_backup}: {e}", file=sys.stderr)
+
 
-def save_state_atomic(entries: List[Dict], state_file: str) -> bool:
-    """Save state atomically using temp file + rename."""
+def save_state_atomic(entries: List[Entry], state_file: str, durable: bool = False) -> bool:
+    """
+    Save state atomically using temp file + rename.
+    durable=True fsyncs before the rename; otherwise the rename is still atomic but
+    a power loss may lose the latest write (the next run simply re-scrapes).
+    """
     try:
         # Validate before saving
         valid_entries, errors = validate_entries(entries)
@@ -278,13 +647,16 @@ def save_state_atomic(entries: List[Dict], state_file: str) -> bool:
 
         # Write to temporary file
         temp_file = f"{state_file}.tmp.{os.getpid()}"
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            json.dump(valid_entries, f, ensure_ascii=False, indent=2)
-            f.flush()
-            os.fsync(f.fileno())  # Force write to disk
+        state_bytes = encode_state_bytes(valid_entries)
+
+        with open(temp_file, 'wb') as f:
+            f.write(state_bytes)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())  # Force write to disk
 
         # Atomic rename
-        os.rename(temp_file, state_file)
+        os.replace(temp_file, state_file)
 
         return True
 
@@ -298,37 +670,70 @@ def save_state_atomic(entries: List[Dict], state_file: str) -> bool:
         return False
 
 
+def state_fingerprint(entries: List[Entry]) -> str:
+    """
+    Hash of everything the diff depends on (id, author, content hash) in order.
+    scraped_at is deliberately excluded: it changes every run.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for entry in entries:
+        entry_hash = entry.get('_h') or compute_entry_hash(entry['content'], entry['timestamp'])
+        digest.update(f"{entry['id']}\x1f{entry['author']}\x1f{entry_hash}\x1e".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def state_is_current(state_file: str, fingerprint: str) -> bool:
+    """True if the state file on disk is the one last saved with this fingerprint."""
+    try:
+        recorded = load_json_bytes(Path(f"{state_file}.fingerprint").read_bytes())
+        stat = os.stat(state_file)
+    except Exception:
+        return False
+
+    return (recorded.get('fingerprint') == fingerprint
+            and recorded.get('size') == stat.st_size
+            and recorded.get('mtime_ns') == stat.st_mtime_ns)
+
+
+def record_state_fingerprint(state_file: str, fingerprint: str):
+    """Remember the fingerprint and file identity of a freshly saved state file."""
+    try:
+        stat = os.stat(state_file)
+        record = {'fingerprint': fingerprint, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        Path(f"{state_file}.fingerprint").write_bytes(dump_json_bytes(record))
+    except Exception as e:
+        print(f"Warning: Failed to record state fingerprint: {e}", file=sys.stderr)
+
+
 # ============================================================================
 # Pure Functions - Diff Computation
 # ============================================================================
 
-def compute_diff(current_entries: List[Dict], previous_state: Dict[str, Dict]) -> Dict:
+def compute_diff(current_entries: List[Entry], previous_state: Dict[str, Entry]) -> Dict:
     """
     Compute differences between current and previous scrape.
     Returns dict with 'new', 'edited', 'deleted' entries.
     """
-    current_by_id = {entry['id']: entry for entry in current_entries}
-    current_ids = set(current_by_id.keys())
-    previous_ids = set(previous_state.keys())
-
-    # New entries: in current but not in previous
-    new_ids = current_ids - previous_ids
-    new_entries = [current_by_id[eid] for eid in new_ids]
-
-    # Deleted entries: in previous but not in current
-    deleted_ids = previous_ids - current_ids
-    deleted_entries = [previous_state[eid] for eid in deleted_ids]
-
-    # Edited entries: in both, but content or timestamp changed
-    common_ids = current_ids & previous_ids
+    new_entries = []
     edited_entries = []
-
-    for eid in common_ids:
-        curr = current_by_id[eid]
-        prev = previous_state[eid]
-
-        # Check if content or timestamp changed
-        if curr['content'] != prev['content'] or curr['timestamp'] != prev['timestamp']:
+    current_ids = set()
+
+    # Bound methods hoisted out of the hot loop
+    previous_get = previous_state.get
+    add_current_id = current_ids.add
+
+    # Single pass over current entries: classify as new, edited or unchanged
+    for curr in current_entries:
+        eid = curr['id']
+        add_current_id(eid)
+        prev = previous_get(eid)
+
+        if prev is None:
+            new_entries.append(curr)
+        elif '_h' in curr and curr['_h'] == prev.get('_h'):
+            # Hashes match: unchanged, skip the full content compare
+            continue
+        elif curr['content'] != prev['content'] or curr['timestamp'] != prev['timestamp']:
             edited_entries.append({
                 'id': eid,
                 'author': curr['author'],
@@ -343,6 +748,13 @@ def compute_diff(current_entries: List[Dict], previous_state: Dict[str, Dict]) -
                 'scraped_at': curr['scraped_at']
             })
 
+    # Deleted entries: in previous but not seen in current. If every current ID was
+    # already known and the counts match, nothing can be missing: skip the scan.
+    if len(current_ids) - len(new_entries) == len(previous_state):
+        deleted_entries = []
+    else:
+        deleted_entries = [prev for eid, prev in previous_state.items() if eid not in current_ids]
+
     return {
         'new': new_entries,
         'edited': edited_entries,
@@ -361,23 +773,52 @@ def compute_diff(current_entries: List[Dict], previous_state: Dict[str, Dict]) -
 # Composition Functions with Failure Tracking
 # ============================================================================
 
-def scrape_page(url: str, headers: Dict[str, str]) -> Tuple[List[Dict], bool]:
+def scrape_page(url: str, headers: Dict[str, str],
+                http_cache: Optional[Dict[str, Dict]] = None,
+                previous_state: Optional[Dict[str, Entry]] = None) -> Tuple[List[Entry], bool]:
     """
     Scrape entries from a single page.
+    With http_cache, sends a conditional GET; on 304 the page's entries are taken
+    from previous_state by the IDs cached for the page.
     Returns (entries, success_flag).
     """
-    html = fetch_html_with_retry(url, headers)
+    cached = http_cache.get(url) if http_cache is not None else None
+    if cached and not cached_page_reusable(cached, previous_state):
+        cached = None  # a 304 couldn't be served: download the page in full
+
+    response = fetch_response_with_retry(url, conditional_headers(headers, cached))
+    if response is None:
+        return [], False
+
+    if response.status_code == 304 and cached:
+        # Page unchanged since last run: skip download and parsing entirely
+        scraped_at = datetime.now().isoformat()
+        return [{**previous_state[eid], 'scraped_at': scraped_at} for eid in cached['ids']], True
+
+    html = response.text
     if not html:
         return [], False
 
-    soup = parse_html(html)
-    entries = extract_entries_from_page(soup)
+    entries = extract_entries_from_html(html)
+
+    if http_cache is not None:
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            http_cache[url] = {'etag': etag, 'last_modified': last_modified, 'ids': [entry['id'] for entry in entries]}
+        else:
+            http_cache.pop(url, None)
+
     return entries, True
 
 
-def scrape_all_pages(base_url: str, headers: Dict[str, str]) -> Tuple[List[Dict], Dict]:
+def scrape_all_pages(base_url: str, headers: Dict[str, str],
+                     http_cache: Optional[Dict[str, Dict]] = None,
+                     previous_state: Optional[Dict[str, Entry]] = None) -> Tuple[List[Entry], Dict]:
     """
     Scrape all pages of a thread.
+    http_cache (see load_http_cache) enables conditional GETs and is updated in place;
+    previous_state supplies the entries of pages answered with 304.
     Returns (entries, metadata) where metadata includes failure info.
     """
     metadata = {
@@ -401,21 +842,39 @@ def scrape_all_pages(base_url: str, headers: Dict[str, str]) -> Tuple[List[Dict]
 
     print(f"Found {page_count} page(s)", file=sys.stderr)
 
-    # Build URLs and scrape each page
-    urls = build_page_urls(base_url, page_count)
+    # The base URL is page 1: reuse it instead of fetching ?p=1 again
+    first_page_entries = extract_entries_fast(html)
+    if first_page_entries is None:
+        first_page_entries = extract_entries_from_page(soup)
 
-    all_entries = []
-    for i, url in enumerate(urls, 1):
-        print(f"Scraping page {i}/{page_count}...", file=sys.stderr)
-        entries, success = scrape_page(url, headers)
+    all_entries = list(first_page_entries)
+    metadata['successful_pages'] = 1
+    print(f"Scraped page 1/{page_count}", file=sys.stderr)
+    print(f"  Found {len(first_page_entries)} entries", file=sys.stderr)
 
-        if success:
-            all_entries.extend(entries)
-            metadata['successful_pages'] += 1
-            print(f"  Found {len(entries)} entries", file=sys.stderr)
-        else:
-            metadata['failed_pages'] += 1
-            print(f"  FAILED to scrape page {i}", file=sys.stderr)
+    # Build URLs for the remaining pages and scrape them
+    urls = build_page_urls(base_url, page_count)[1:]
+
+    # Fetch pages concurrently; map() keeps results in page order
+    max_workers = max(1, min(MAX_CONCURRENT_PAGES, len(urls)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda page_url: scrape_page(page_url, headers, http_cache, previous_state), urls)
+
+        for i, (entries, success) in enumerate(results, 2):
+            print(f"Scraped page {i}/{page_count}", file=sys.stderr)
+
+            if success:
+                all_entries.extend(entries)
+                metadata['successful_pages'] += 1
+                print(f"  Found {len(entries)} entries", file=sys.stderr)
+            else:
+                metadata['failed_pages'] += 1
+                print(f"  FAILED to scrape page {i}", file=sys.stderr)
+
+    # Drop cached pages that no longer belong to the thread
+    if http_cache is not None:
+        for cached_url in set(http_cache) - set(urls):
+            del http_cache[cached_url]
 
     # Mark as partial if any pages failed
     if metadata['failed_pages'] > 0:
@@ -430,22 +889,33 @@ def scrape_all_pages(base_url: str, headers: Dict[str, str]) -> Tuple[List[Dict]
 # Output Functions
 # ============================================================================
 
+def public_entries(entries: List[Entry]) -> List[Dict]:
+    """Entries as written to the output: '_'-prefixed fields (e.g. '_h') are kept in the state only."""
+    return [{key: value for key, value in entry.items() if not key.startswith('_')} for entry in entries]
+
+
+def public_diff(diff: Dict) -> Dict:
+    """compute_diff result with internal fields removed from its new and deleted entries."""
+    return {**diff, 'new': public_entries(diff['new']), 'deleted': public_entries(diff['deleted'])}
+
+
 def format_json(data: any) -> str:
     """Format data as JSON string."""
-    return json.dumps(data, ensure_ascii=False, indent=2)
+    return dump_json_bytes(data).decode('utf-8')
 
 
-def write_output_atomic(data: str, output_file: str) -> bool:
-    """Write output atomically using temp file + rename."""
+def write_output_atomic(data: str, output_file: str, durable: bool = False) -> bool:
+    """Write output atomically using temp file + rename (fsync first if durable)."""
     try:
         temp_file = f"{output_file}.tmp.{os.getpid()}"
 
         with open(temp_file, 'w', encoding='utf-8') as f:
             f.write(data)
-            f.flush()
-            os.fsync(f.fileno())
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
 
-        os.rename(temp_file, output_file)
+        os.replace(temp_file, output_file)
         return True
 
     except Exception as e:
@@ -457,10 +927,10 @@ def write_output_atomic(data: str, output_file: str) -> bool:
         return False
 
 
-def write_output(data: str, output_file: Optional[str] = None) -> bool:
+def write_output(data: str, output_file: Optional[str] = None, durable: bool = False) -> bool:
     """Write data to file or stdout."""
     if output_file:
-        success = write_output_atomic(data, output_file)
+        success = write_output_atomic(data, output_file, durable)
         if success:
             print(f"Output written to {output_file}", file=sys.stderr)
         return success
@@ -490,7 +960,9 @@ def parse_args(args: List[str]) -> Optional[Dict]:
         'output_file': None,
         'state_file': None,
         'diff_only': False,
-        'lock_file': None
+        'durable': False,
+        'lock_file': None,
+        'http_cache_file': None
     }
 
     i = 2
@@ -502,10 +974,14 @@ def parse_args(args: List[str]) -> Optional[Dict]:
             config['state_file'] = args[i + 1]
             # Auto-generate lock file path from state file
             config['lock_file'] = f"{args[i + 1]}.lock"
+            config['http_cache_file'] = f"{args[i + 1]}.http_cache"
             i += 2
         elif args[i] == '--diff-only':
             config['diff_only'] = True
             i += 1
+        elif args[i] == '--durable':
+            config['durable'] = True
+            i += 1
         else:
             i += 1
 
@@ -524,8 +1000,9 @@ def main():
         print("Usage: python scraper.py <url> [options]", file=sys.stderr)
         print("\nOptions:", file=sys.stderr)
         print("  --output <file>    Write output to file (default: stdout)", file=sys.stderr)
-        print("  --state <file>     State file for diff tracking (enables locking)", file=sys.stderr)
+        print("  --state <file>     State file for diff tracking (enables locking, HTTP caching)", file=sys.stderr)
         print("  --diff-only        Output only the diff (not full data)", file=sys.stderr)
+        print("  --durable          fsync state/output files before renaming them", file=sys.stderr)
         print("\nProduction Features:", file=sys.stderr)
         print("  • Atomic file writes (no corruption on crash)", file=sys.stderr)
         print("  • Automatic state backups (last 5 versions)", file=sys.stderr)
@@ -543,7 +1020,9 @@ def main():
     output_file = config['output_file']
     state_file = config['state_file']
     diff_only = config['diff_only']
+    durable = config['durable']
     lock_file = config['lock_file']
+    http_cache_file = config['http_cache_file']
 
     # Acquire lock if using state file (prevents concurrent runs)
     lock_context = acquire_lock(lock_file) if lock_file else contextmanager(lambda: (yield None))()
@@ -554,7 +1033,14 @@ def main():
 
         # Pipeline: scrape -> validate -> compute diff -> save state -> output
         headers = get_headers()
-        current_entries, metadata = scrape_all_pages(url, headers)
+        # Loaded before scraping: pages answered with 304 are rebuilt from it
+        previous_state = {}
+        if state_file:
+            print(f"Loading previous state from: {state_file}", file=sys.stderr)
+            previous_state = load_state(state_file)
+        http_cache = load_http_cache(http_cache_file) if http_cache_file else None
+        http_cache_before = dict(http_cache) if http_cache is not None else None
+        current_entries, metadata = scrape_all_pages(url, headers, http_cache, previous_state)
 
         print("=" * 60, file=sys.stderr)
         print(f"Total entries scraped: {len(current_entries)}", file=sys.stderr)
@@ -572,9 +1058,6 @@ def main():
 
         # If state file provided, compute diff
         if state_file:
-            print(f"Loading previous state from: {state_file}", file=sys.stderr)
-            previous_state = load_state(state_file)
-
             if previous_state:
                 print(f"Previous state: {len(previous_state)} entries", file=sys.stderr)
                 diff = compute_diff(valid_entries, previous_state)
@@ -584,46 +1067,58 @@ def main():
                 print(f"  Edited entries:  {diff['summary']['edited_count']}", file=sys.stderr)
                 print(f"  Deleted entries: {diff['summary']['deleted_count']}", file=sys.stderr)
 
-                # Save updated state atomically
-                if not save_state_atomic(valid_entries, state_file):
-                    print("ERROR: Failed to save state", file=sys.stderr)
-                    sys.exit(1)
+                # Save updated state atomically, unless nothing but scraped_at changed
+                fingerprint = state_fingerprint(valid_entries)
+                if state_is_current(state_file, fingerprint):
+                    print(f"State unchanged, not rewriting: {state_file}", file=sys.stderr)
+                else:
+                    if not save_state_atomic(valid_entries, state_file, durable):
+                        print("ERROR: Failed to save state", file=sys.stderr)
+                        sys.exit(1)
 
-                print(f"State updated: {state_file}", file=sys.stderr)
+                    record_state_fingerprint(state_file, fingerprint)
+                    print(f"State updated: {state_file}", file=sys.stderr)
 
                 # Output diff or full data based on flag
                 if diff_only:
                     output_data = {
-                        **diff,
+                        **public_diff(diff),
                         'metadata': metadata
                     }
                 else:
                     output_data = {
-                        'entries': valid_entries,
-                        'diff': diff,
+                        'entries': public_entries(valid_entries),
+                        'diff': public_diff(diff),
                         'metadata': metadata
                     }
             else:
                 print("No previous state found. This is the first run.", file=sys.stderr)
 
                 # Save initial state atomically
-                if not save_state_atomic(valid_entries, state_file):
+                if not save_state_atomic(valid_entries, state_file, durable):
                     print("ERROR: Failed to save initial state", file=sys.stderr)
                     sys.exit(1)
 
+                record_state_fingerprint(state_file, state_fingerprint(valid_entries))
+
                 print(f"Initial state saved: {state_file}", file=sys.stderr)
                 output_data = {
-                    'entries': valid_entries,
+                    'entries': public_entries(valid_entries),
                     'diff': None,
                     'metadata': metadata
                 }
         else:
             # No state file, just output current entries
             output_data = {
-                'entries': valid_entries,
+                'entries': public_entries(valid_entries),
                 'metadata': metadata
             }
 
+        # Saved after the state: the cached IDs must be backed by entries in it.
+        # Most runs see the same validators on every page, so there is nothing to write
+        if http_cache_file and http_cache != http_cache_before:
+            save_http_cache(http_cache, http_cache_file)
+
         # Add warning if partial scrape
         if metadata['partial_scrape']:
             print("\n⚠️  WARNING: PARTIAL SCRAPE DETECTED", file=sys.stderr)
@@ -632,7 +1127,7 @@ def main():
 
         # Output results
         json_output = format_json(output_data)
-        if not write_output(json_output, output_file):
+        if not write_output(json_output, output_file, durable):
             sys.exit(1)
 
         # Exit with code 2 if partial scrape (warning)
@@ -16,7 +16,7 @@ LOCK_FILE="${STATE_FILE}.lock"
 
 # Cleanup function
 cleanup() {
-    rm -f "$STATE_FILE" "$STATE_FILE".backup.* "$STATE_FILE.tmp".*
+    rm -f "$STATE_FILE" "$STATE_FILE".backup.* "$STATE_FILE.tmp".* "$STATE_FILE.http_cache" "$STATE_FILE.fingerprint"
     rm -f "$OUTPUT_FILE" "$OUTPUT_FILE.tmp".*
     rm -f "$LOCK_FILE"
 }
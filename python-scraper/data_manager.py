@@ -1,46 +1,177 @@
 import os
-import json
-from typing import List
-from entry import Entry
+import orjson
+import msgpack
+import zstandard as zstd
 from dataclasses import asdict
+from typing import Dict, Iterable, List, Optional
+from entry import Entry
+
+# state files with this suffix are stored as one zstd-compressed msgpack blob instead of JSONL
+BINARY_SUFFIX = '.msgpack.zst'
+
+# changes since the last full write go to <state file>.journal; it is folded back into the state file
+# every COMPACT_EVERY cycles (hourly with the 10 minute schedule) or once it outgrows the state 3x
+JOURNAL_SUFFIX = '.journal'
+COMPACT_EVERY = 6
+COMPACT_RATIO = 3
 
 class DataManager:
     def __init__(self, data_output_file: str, data_diff_file: str):
         self.data_output_file = data_output_file
         self.data_diff_file = data_diff_file
+        self.journal_file = data_output_file + JOURNAL_SUFFIX
+        self._journal_records = 0
+        self._cycles_since_compaction = 0
+        # last saved entries by id; loaded from disk once, then kept current by save_data/append_new.
+        # diff() and compact() treat it as the saved state, so it holds every entry (no size cap)
+        self._old_index: Dict[int, Entry] = self.load_index()
+
+    def get_entry(self, entry_id: int) -> Optional[Entry]:
+        # last saved version of an entry, or None if it isn't in the state
+        return self._old_index.get(entry_id)
+
+    def load_index(self) -> Dict[int, Entry]:
+        # builds the id -> entry map; JSONL state is streamed line by line straight into it
+        index = {}
+        jsonl_file = self.data_output_file
+        if self.data_output_file.endswith(BINARY_SUFFIX):
+            jsonl_file = None
+            if os.path.exists(self.data_output_file):
+                for row in self.load_data_binary():
+                    entry = Entry(*row)
+                    index[entry.id] = entry
+            else:
+                # first run after switching to the binary format: start from the old JSONL state
+                jsonl_file = self.data_output_file[:-len(BINARY_SUFFIX)] + '.jsonl'
+        if jsonl_file and os.path.exists(jsonl_file):
+            self._read_jsonl(jsonl_file, index)
+        self._journal_records = self._read_jsonl(self.journal_file, index) if os.path.exists(self.journal_file) else 0
+        return index
+
+    def _read_jsonl(self, path: str, index: Dict[int, Entry]) -> int:
+        # applies each line to the index in order; journal lines carry an _op ('new'/'edit'/'del')
+        records = 0
+        try:
+            with open(path, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        try:
+                            obj = orjson.loads(line)
+                        except orjson.JSONDecodeError:
+                            # e.g. a line torn by a crash, with the next append joined onto it;
+                            # skip just that line so the records after it still replay
+                            print(f"Warning: skipping corrupted line in {path}.")
+                            continue
+                        records += 1
+                        if obj.get('_op') == 'del':
+                            index.pop(obj['id'], None)
+                            continue
+                        # keyed by entry.id, which Entry has already turned into an int
+                        entry = Entry(obj['id'], obj['author'], obj['timestamp'], obj['content'], obj['scraped_at'],
+                                      obj.get('content_hash', 0), obj.get('content_len', 0))
+                        index[entry.id] = entry
+        except Exception as e:
+            print(f"Error loading data from {path}: {e}")
+        return records
 
     def load_data(self) -> List[Entry]:
-        data = []
-        if os.path.exists(self.data_output_file):
-            try:
-                with open(self.data_output_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        obj = json.loads(line)
-                        data.append(Entry(**obj))
-            except Exception as e:
-                print(f"Error loading data from {self.data_output_file}: {e}")
-        return data
+        return list(self.load_index().values())
+
+    def load_data_binary(self) -> List[list]:
+        # rows hold the Entry fields in declaration order
+        if not os.path.exists(self.data_output_file):
+            return []
+        try:
+            with open(self.data_output_file, 'rb') as f:
+                return msgpack.unpackb(zstd.ZstdDecompressor().decompress(f.read()), raw=False)
+        except Exception as e:
+            print(f"Error loading data from {self.data_output_file}: {e}")
+            return []
+
+    def save_data_binary(self, entries: List[Entry]) -> None:
+        rows = [[entry.id, entry.author, entry.timestamp, entry.content, entry.scraped_at,
+                 entry.content_hash, entry.content_len] for entry in entries]
+        # one blob can't be read back if the write is cut short, so replace the old file only once it's complete
+        temp_file = self.data_output_file + '.tmp'
+        try:
+            with open(temp_file, 'wb') as f:
+                f.write(zstd.ZstdCompressor(level=3).compress(msgpack.packb(rows)))
+            os.replace(temp_file, self.data_output_file)
+        except Exception:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
 
     def save_data(self, entries: List[Entry]) -> None:
         try:
-            with open(self.data_output_file, 'w', encoding='utf-8') as f:
-                for entry in entries:
-                    json.dump(asdict(entry), f, ensure_ascii=False)
-                    f.write('\n')
+            if self.data_output_file.endswith(BINARY_SUFFIX):
+                self.save_data_binary(entries)
+            else:
+                with open(self.data_output_file, 'wb') as f:
+                    # orjson serializes dataclasses directly and writes UTF-8 like ensure_ascii=False
+                    f.write(b''.join(orjson.dumps(entry) + b'\n' for entry in entries))
+            # the full state supersedes whatever the journal held
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
         except Exception as e:
             print(f"Error saving data to {self.data_output_file}: {e}")
+            return
+        self._journal_records = 0
+        self._cycles_since_compaction = 0
+        self._sync_index(entries)
+
+    def _sync_index(self, entries: List[Entry]) -> None:
+        # keep the index in step with what is now on disk
+        new_ids = {entry.id for entry in entries}
+        for entry_id in [entry_id for entry_id in self._old_index if entry_id not in new_ids]:
+            del self._old_index[entry_id]
+        for entry in entries:
+            self._old_index[entry.id] = entry
+
+    def append_new(self, entries: Iterable[Entry]) -> bool:
+        # records only what changed since the last save instead of rewriting the whole state file;
+        # returns False if the changes could not be written
+        entries = list(entries)
+        new_ids = {entry.id for entry in entries}
+        records = [orjson.dumps({'_op': 'del', 'id': entry_id}) for entry_id in self._old_index if entry_id not in new_ids]
+        for entry in entries:
+            old_entry = self._old_index.get(entry.id)
+            if old_entry is None:
+                records.append(orjson.dumps(dict(asdict(entry), _op='new')))
+            elif entry.content_hash != old_entry.content_hash or entry.content_len != old_entry.content_len:
+                records.append(orjson.dumps(dict(asdict(entry), _op='edit')))
+        try:
+            if records:
+                with open(self.journal_file, 'ab') as f:
+                    f.write(b''.join(record + b'\n' for record in records))
+        except Exception as e:
+            print(f"Error appending data to {self.journal_file}: {e}")
+            return False
+        self._journal_records += len(records)
+        self._cycles_since_compaction += 1
+        self._sync_index(entries)
+        if (self._cycles_since_compaction >= COMPACT_EVERY
+                or self._journal_records > COMPACT_RATIO * max(len(self._old_index), 1)):
+            self.compact()
+        return True
+
+    def compact(self) -> None:
+        # folds the journal into a fresh state file
+        self.save_data(list(self._old_index.values()))
 
-    def diff(self, old_data: List[Entry], new_data: List[Entry]) -> List[dict]:
-        old_map = {entry.id: entry for entry in old_data}
+    def diff(self, new_data: List[Entry]) -> List[dict]:
+        # bound once: on a quiet cycle nearly every entry exits after this lookup and the hash compare
+        old_get = self._old_index.get
         diffs = []
         for entry in new_data:
-            old_entry = old_map.get(entry.id) # this is checking if the entry is already in the old data
-            if not old_entry: # if the entry is not in the old data, it is a new entry
+            old_entry = old_get(entry.id) # this is checking if the entry is already in the old data
+            if old_entry is None: # if the entry is not in the old data, it is a new entry
                 diffs.append({'id': entry.id, 'type': 'new', 'content': entry.content, 'timestamp': entry.timestamp})
-            elif entry.content != old_entry.content: # if the entry is in the old data, but the content is different, it is an edited entry
-                if entry.content.startswith(old_entry.content): # we ignore the edits for the original body(only append the edits after the original body)
-                    appended = entry.content[len(old_entry.content):]
-                    if appended.strip():
+            elif entry.content_hash != old_entry.content_hash or entry.content_len != old_entry.content_len: # if the entry is in the old data, but the content is different, it is an edited entry
+                # we ignore the edits for the original body(only append the edits after the original body)
+                if entry.content_len > old_entry.content_len and entry.content.startswith(old_entry.content):
+                    appended = entry.content[old_entry.content_len:]
+                    if not appended.isspace(): # tail is non-empty here; isspace() checks it without strip()'s copy
                         diffs.append({'id': entry.id, 'type': 'appended', 'content': appended, 'timestamp': entry.timestamp})
                 else:
                     diffs.append({'id': entry.id, 'type': 'edited', 'content': entry.content, 'timestamp': entry.timestamp})
@@ -48,9 +179,7 @@ class DataManager:
 
     def save_diff(self, diff: List[dict]) -> None:
         try:
-            with open(self.data_diff_file, 'w', encoding='utf-8') as f:
-                for entry in diff:
-                    json.dump(entry, f, ensure_ascii=False)
-                    f.write('\n')
+            with open(self.data_diff_file, 'wb') as f:
+                f.write(b''.join(orjson.dumps(entry) + b'\n' for entry in diff))
         except Exception as e:
             print(f"Error saving diff to {self.data_diff_file}: {e}")
\ No newline at end of file
@@ -1,9 +1,25 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from hashlib import blake2b
 
-@dataclass
+def content_digest(content: str) -> int:
+    # 64-bit digest so diff can compare entry bodies with one int compare
+    return int.from_bytes(blake2b(content.encode('utf-8'), digest_size=8).digest(), 'little')
+
+@dataclass(slots=True)
 class Entry:
-    id: str
+    id: int  # numeric on eksisozluk; an id that isn't a number is kept as the original str
     author: str
     timestamp: str
     content: str
-    scraped_at: str 
\ No newline at end of file
+    scraped_at: str
+    content_hash: int = field(default=0, compare=False)
+    content_len: int = field(default=0, compare=False)
+
+    def __post_init__(self):
+        # parsed pages and files written before ids were ints give str ids; int keys hash and compare faster
+        if isinstance(self.id, str) and self.id.isdecimal():
+            self.id = int(self.id)
+        # filled in for freshly parsed entries and for files saved before these fields existed
+        if not self.content_hash:
+            self.content_hash = content_digest(self.content)
+            self.content_len = len(self.content)
@@ -1,8 +1,10 @@
 import os
+import gc
+import threading
+import resource
 import schedule
 import time
-import json
-from dataclasses import asdict
+import orjson
 from datetime import datetime
 from data_manager import DataManager
 from scraper_module import EksiScraper
@@ -15,39 +17,41 @@ def save_debug_files(new_data, diff):
     diff_path = os.path.join(debug_dir, f"diff_{timestamp}.jsonl")
 
     # Save new_data
-    with open(new_data_path, "w", encoding="utf-8") as f:
-        for entry in new_data:
-            json.dump(asdict(entry), f, ensure_ascii=False)
-            f.write("\n")
+    with open(new_data_path, "wb") as f:
+        f.write(b"".join(orjson.dumps(entry) + b"\n" for entry in new_data))
 
     # Save diff
-    with open(diff_path, "w", encoding="utf-8") as f:
-        for entry in diff:
-            json.dump(entry, f, ensure_ascii=False)
-            f.write("\n")
+    with open(diff_path, "wb") as f:
+        f.write(b"".join(orjson.dumps(entry) + b"\n" for entry in diff))
 
-def main():
-    BASE_URL = "https://eksisozluk.com/6-subat-2023-kahramanmaras-depremi--7568601"
-    DATA_OUTPUT_FILE = "scraped_data.jsonl"
-    DATA_DIFF_FILE = "data_diff.jsonl"
-    INTERRUPTED_FILE = "x_interrupted.jsonl"
-    
-    data_manager = DataManager(DATA_OUTPUT_FILE, DATA_DIFF_FILE)
-    scraper = EksiScraper(BASE_URL, interrupted_file=INTERRUPTED_FILE)
-    
+BASE_URL = "https://eksisozluk.com/6-subat-2023-kahramanmaras-depremi--7568601"
+# compressed msgpack state; only the diff file stays JSONL for consumers
+DATA_OUTPUT_FILE = "scraped_data.msgpack.zst"
+DATA_DIFF_FILE = "data_diff.jsonl"
+INTERRUPTED_FILE = "x_interrupted.jsonl"
+# set SCRAPER_DEBUG=1 to also keep a copy of every run's data and diff under data_debug/
+DEBUG = bool(os.environ.get("SCRAPER_DEBUG"))
+HTTP_CACHE_FILE = "scraped_data.http_cache.json"
+
+def main(data_manager: DataManager, scraper: EksiScraper):
+    # data_manager and scraper live for the whole process so the old entry index
+    # and the HTTP session carry over between scheduled runs
     try:
-        old_data = data_manager.load_data()
         new_data = scraper.scrape()
         
         # Only proceed if we got some data back
         if new_data:
-            diff = data_manager.diff(old_data, new_data)
+            diff = data_manager.diff(new_data)
             print(f"Diff (new entries): {len(diff)}")
-            data_manager.save_data(new_data)  # replace old with new
+            # journal what changed; compacted into the state file periodically
+            if data_manager.append_new(new_data):
+                scraper.commit_http_cache()  # the new validators now match the saved entries
             data_manager.save_diff(diff) # update diff file to pass for processing
             
-            # FOR DEBUGGING
-            save_debug_files(new_data, diff)
+            # FOR DEBUGGING; written in the background so it stays off the scrape-to-diff path
+            if DEBUG:
+                threading.Thread(target=save_debug_files, args=(new_data, diff), daemon=True).start()
+            del diff
 
             # Delete interrupted file if it exists (successful scrape)
             if os.path.exists(INTERRUPTED_FILE):
@@ -55,15 +59,24 @@ def main():
                 print(f"Deleted {INTERRUPTED_FILE} after successful scrape.")
         else:
             print("No data was scraped, skipping file updates.")
+        # drop this run's entries before sleeping so RSS returns to the same floor every cycle
+        del new_data
             
     except Exception as e:
         print(f"Error during scraping: {e}")
         print("Skipping file updates due to error.")
         return
+    finally:
+        gc.collect()
+        # ru_maxrss is in KiB on Linux; a value that keeps climbing across cycles means a leak
+        print(f"Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MiB")
 
 if __name__ == "__main__":
-    main()
-    schedule.every(10).minutes.do(main)
+    data_manager = DataManager(DATA_OUTPUT_FILE, DATA_DIFF_FILE)
+    scraper = EksiScraper(BASE_URL, interrupted_file=INTERRUPTED_FILE, http_cache_file=HTTP_CACHE_FILE,
+                          entry_lookup=data_manager.get_entry)
+    main(data_manager, scraper)
+    schedule.every(10).minutes.do(main, data_manager, scraper)
     print("Scheduler started. Running every 10 minutes...")
     while True:
         schedule.run_pending()
@@ -1,94 +1,316 @@
 import requests
-from bs4 import BeautifulSoup
-from typing import List, Optional
+from requests.adapters import HTTPAdapter
+from lxml import etree, html as lxml_html
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 from entry import Entry
-import json
+import orjson
+import os
+import multiprocessing
+import re
+import html as html_lib
+
+def has_class(name: str) -> str:
+    # XPath predicate matching one token of the class attribute (like BeautifulSoup's class_=)
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# compiled once at import (and so once per parse process); XPath objects are safe to call from threads
+PAGER_XPATH = etree.XPath(f"//div[{has_class('pager')}]/@data-pagecount")
+ENTRIES_XPATH = etree.XPath("(//ul[@id='entry-item-list'])[1]//li[@data-id]")
+CONTENT_XPATH = etree.XPath(f".//div[{has_class('content')}]")
+DATE_XPATH = etree.XPath(f".//a[{has_class('entry-date')}]")
+
+# regex fast path over the raw page; entry markup on eksisozluk is regular enough to skip the DOM
+ENTRY_LIST_MARKER = 'id="entry-item-list"'
+ENTRY_START_RE = re.compile(r'<li\b[^>]*\bdata-id="[^"]*"[^>]*>')
+ATTR_RE = re.compile(r'([\w:-]+)="([^"]*)"')
+CONTENT_RE = re.compile(r'<div\b[^>]*\bclass="content(?: [^"]*)?"[^>]*>(.*?)</div>', re.DOTALL)
+DATE_RE = re.compile(r'<a\b[^>]*\bclass="entry-date(?: [^"]*)?"[^>]*>(.*?)</a>', re.DOTALL)
+TAG_RE = re.compile(r'<[^>]*>')
+# content the regexes can't be trusted with (nested divs would end CONTENT_RE early)
+IRREGULAR_MARKUP = ('<div', '<!--', '<script', '<style', '<![CDATA[')
+
+# pages are served as UTF-8; without this lxml falls back to latin-1 when there is no meta charset.
+# Only used from the main thread of a process (the scrape loop or a parse process)
+UTF8_PARSER = lxml_html.HTMLParser(encoding='utf-8')
+
+# below this many pages, starting parse processes costs more than it saves
+PROCESS_PARSE_MIN_PAGES = 3
+# parse processes are started by a fork server: forking this process directly would copy it
+# while fetch threads hold sockets and locks
+PARSE_MP_CONTEXT = multiprocessing.get_context('forkserver')
+
+def element_text(element, separator: str = '') -> str:
+    # same result as BeautifulSoup's get_text(separator=..., strip=True)
+    return separator.join(text for text in (t.strip() for t in element.itertext()) if text)
+
+def parse_entry_element(entry_element, scraped_at: str) -> Optional[Entry]:
+    entry_id = entry_element.get('data-id')
+    if not entry_id:
+        return None
+    content_divs = CONTENT_XPATH(entry_element)
+    date_divs = DATE_XPATH(entry_element)
+    content = element_text(content_divs[0], separator='\n') if content_divs else "N/A"
+    author = entry_element.get('data-author', "N/A")
+    timestamp_raw = element_text(date_divs[0]) if date_divs else "N/A"
+    return Entry(
+        id=entry_id,
+        author=author,
+        timestamp=timestamp_raw,
+        content=content,
+        scraped_at=scraped_at
+    )
+
+def fragment_text(fragment: str, separator: str = '') -> str:
+    # element_text for a raw HTML fragment
+    texts = (html_lib.unescape(text).strip() for text in TAG_RE.split(fragment))
+    return separator.join(text for text in texts if text)
+
+def parse_entries_fast(page: str, scraped_at: str) -> Optional[List[Entry]]:
+    # returns None when the markup isn't the expected shape so the caller can use the DOM instead
+    list_start = page.find(ENTRY_LIST_MARKER)
+    if list_start < 0:
+        return None
+    starts = list(ENTRY_START_RE.finditer(page, list_start))
+    entries = []
+    for i, start in enumerate(starts):
+        attrs = {name: html_lib.unescape(value) for name, value in ATTR_RE.findall(start.group(0))}
+        if not attrs.get('data-id'):
+            return None
+        segment_end = starts[i + 1].start() if i + 1 < len(starts) else len(page)
+        content_match = CONTENT_RE.search(page, start.end(), segment_end)
+        date_match = content_match and DATE_RE.search(page, content_match.end(), segment_end)
+        if not date_match or any(marker in content_match.group(1) for marker in IRREGULAR_MARKUP):
+            return None
+        entries.append(Entry(
+            id=attrs['data-id'],
+            author=attrs.get('data-author', "N/A"),
+            timestamp=fragment_text(date_match.group(1)),
+            content=fragment_text(content_match.group(1), separator='\n'),
+            scraped_at=scraped_at
+        ))
+    return entries
+
+def _parse_page_bytes(html_bytes: bytes, scraped_at: str) -> List[Entry]:
+    # module level so ProcessPoolExecutor can pickle it; Entry objects pickle back to the parent
+    # a page that fails to parse yields no entries instead of failing the whole scrape
+    if not html_bytes:
+        return []
+    try:
+        entries = parse_entries_fast(html_bytes.decode('utf-8'), scraped_at)
+    except UnicodeDecodeError:
+        entries = None
+    if entries is not None:
+        return entries
+    try:
+        tree = lxml_html.fromstring(html_bytes, parser=UTF8_PARSER)
+        return [entry for entry in (parse_entry_element(element, scraped_at) for element in ENTRIES_XPATH(tree)) if entry]
+    except Exception as e:
+        print(f"An error occurred parsing a page: {e}")
+        return []
 
 class EksiScraper:
-    def __init__(self, base_url: str, interrupted_file: Optional[str] = None):
+    def __init__(self, base_url: str, interrupted_file: Optional[str] = None, max_workers: int = 8,
+                 http_cache_file: Optional[str] = None,
+                 entry_lookup: Optional[Callable[[int], Optional[Entry]]] = None):
         self.base_url = base_url
         self.user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         self.headers = {'User-Agent': self.user_agent}
+        # page number -> {'etag', 'last_modified', 'ids'} from the last 200 response of each page;
+        # a 304 page's entries are looked up by id (e.g. DataManager.get_entry) rather than stored here
+        self.http_cache_file = http_cache_file
+        self.entry_lookup = entry_lookup
+        self._http_cache: Dict[str, dict] = self.load_http_cache()
+        # the cache as updated by the last scrape, waiting for commit_http_cache()
+        self._pending_http_cache: Optional[Dict[str, dict]] = None
         self.interrupted_file = interrupted_file
+        # held open for the whole of scrape() so entries aren't written with one open() each
+        self._interrupted_fh = None
+        self.max_workers = max_workers
+        # one pooled session so TCP/TLS connections are reused across pages and worker threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
-    def get_page_count(self, soup: BeautifulSoup) -> int:
-        pager = soup.find('div', class_='pager')
-        if not pager or 'data-pagecount' not in pager.attrs:
+    def get_page_count(self, tree) -> int:
+        page_counts = PAGER_XPATH(tree)
+        if not page_counts:
             print("Could not find pager or page count. Scraping only first page.")
             return 1
         try:
-            return int(pager['data-pagecount'])
+            return int(page_counts[0])
         except ValueError:
             print("Could not parse page count. Scraping only first page.")
             return 1
 
-    def parse_entry(self, entry_element) -> Optional[Entry]:
-        entry_id = entry_element.get('data-id')
-        if not entry_id:
-            return None
-        content_div = entry_element.find('div', class_='content')
-        date_div = entry_element.find('a', class_='entry-date')
-        content = content_div.get_text(separator='\n', strip=True) if content_div else "N/A"
-        author = entry_element.get('data-author', "N/A")
-        timestamp_raw = date_div.get_text(strip=True) if date_div else "N/A"
-        return Entry(
-            id=entry_id,
-            author=author,
-            timestamp=timestamp_raw,
-            content=content,
-            scraped_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        )
+    def parse_entry(self, entry_element, scraped_at: str) -> Optional[Entry]:
+        return parse_entry_element(entry_element, scraped_at)
 
     def append_to_interrupted(self, entry: Entry):
         if self.interrupted_file:
             try:
-                with open(self.interrupted_file, 'a', encoding='utf-8') as f:
-                    json.dump(entry.__dict__, f, ensure_ascii=False)
-                    f.write('\n')
+                line = orjson.dumps(entry).decode() + '\n'
+                if self._interrupted_fh is not None:
+                    self._interrupted_fh.write(line)
+                else:
+                    with open(self.interrupted_file, 'a', encoding='utf-8') as f:
+                        f.write(line)
             except Exception as e:
                 print(f"Error writing to interrupted file: {e}")
 
+    def load_http_cache(self) -> Dict[str, dict]:
+        if self.http_cache_file and os.path.exists(self.http_cache_file):
+            try:
+                with open(self.http_cache_file, 'rb') as f:
+                    return orjson.loads(f.read())
+            except Exception as e:
+                print(f"Error loading HTTP cache from {self.http_cache_file}: {e}")
+        return {}
+
+    def save_http_cache(self) -> None:
+        try:
+            with open(self.http_cache_file, 'wb') as f:
+                f.write(orjson.dumps(self._http_cache))
+        except Exception as e:
+            print(f"Error saving HTTP cache to {self.http_cache_file}: {e}")
+
+    def commit_http_cache(self) -> None:
+        # called once the scraped entries are saved: only then may the new validators be sent,
+        # or a 304 would be rebuilt from entries that never made it into the state
+        if self._pending_http_cache is None:
+            return
+        self._http_cache, self._pending_http_cache = self._pending_http_cache, None
+        self.save_http_cache()
+
+    def conditional_headers(self, current_page: int) -> dict:
+        cached = self._http_cache.get(str(current_page))
+        if not self.http_cache_file or not cached or not self.can_rebuild(cached):
+            return self.headers
+        headers = dict(self.headers)
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+        return headers
+
+    def can_rebuild(self, cached: dict) -> bool:
+        # only ask for a 304 if every entry of the page can be taken from the lookup afterwards
+        return (self.entry_lookup is not None and 'ids' in cached
+                and all(self.entry_lookup(entry_id) is not None for entry_id in cached['ids']))
+
+    def fetch_page(self, current_page: int) -> Tuple[Optional[bytes], Optional[dict]]:
+        # runs in a worker thread: returns the page body and the response validators;
+        # the body is None when the server answered 304 Not Modified
+        page_url = f"{self.base_url}?p={current_page}"
+        print(f"Scraping page {current_page}: {page_url}")
+        try:
+            response_page = self.session.get(page_url, headers=self.conditional_headers(current_page), timeout=20)
+            if self.http_cache_file and response_page.status_code == 304:
+                print(f"Page {current_page} not modified.")
+                return None, None
+            response_page.raise_for_status()
+            validators = None
+            if self.http_cache_file:
+                validators = {'etag': response_page.headers.get('ETag'),
+                              'last_modified': response_page.headers.get('Last-Modified')}
+            return response_page.content, validators
+        except requests.exceptions.RequestException as e:
+            print(f"HTTP Request error for page {current_page}: {e}")
+        except Exception as e:
+            print(f"An error occurred processing page {current_page}: {e}")
+        return b'', None
+
+    def fetch_and_parse(self, current_page: int, scraped_at: str,
+                        parse_pool: Optional[ProcessPoolExecutor]) -> Tuple[Optional[List[Entry]], Optional[dict], bool]:
+        # runs in a worker thread: the body is parsed as soon as it arrives and then dropped, so only
+        # entries wait for the in-order consumer. Returns (entries, validators, got a body);
+        # entries is None for a 304 page
+        body, validators = self.fetch_page(current_page)
+        if body is None:
+            return None, None, False
+        try:
+            if parse_pool is not None:
+                parsed = parse_pool.submit(_parse_page_bytes, body, scraped_at).result()
+            else:
+                parsed = _parse_page_bytes(body, scraped_at)
+        except Exception as e:
+            print(f"An error occurred parsing page {current_page}: {e}")
+            parsed = []
+        return parsed, validators, bool(body)
+
     def scrape(self) -> List[Entry]:
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Starting scrape job...")
         entries: List[Entry] = []
+        if self.interrupted_file:
+            try:
+                self._interrupted_fh = open(self.interrupted_file, 'a', encoding='utf-8', buffering=1 << 16)
+            except OSError as e:
+                print(f"Error opening interrupted file: {e}")
         try:
-            response = requests.get(self.base_url, headers=self.headers, timeout=20)
+            response = self.session.get(self.base_url, headers=self.headers, timeout=20)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            last_page = self.get_page_count(soup)
+            tree = lxml_html.fromstring(response.content, parser=UTF8_PARSER)
+            last_page = self.get_page_count(tree)
             print(f"Found {last_page} pages.")
-            # Scrape from first page to last page (inclusive)
-            for current_page in range(1, last_page + 1):
-                page_url = f"{self.base_url}?p={current_page}"
-                print(f"Scraping page {current_page}: {page_url}")
-                try:
-                    response_page = requests.get(page_url, headers=self.headers, timeout=20)
-                    response_page.raise_for_status()
-                    soup_page = BeautifulSoup(response_page.text, 'html.parser')
-                    entry_list = soup_page.find('ul', id='entry-item-list')
-                    if not entry_list:
-                        print(f"Could not find entry list on page {current_page}.")
-                        continue
-                    page_entries = entry_list.find_all('li', attrs={'data-id': True})
-                    if not page_entries:
-                        print(f"No entries with data-id found on page {current_page}.")
-                        continue
-                    print(f"Found {len(page_entries)} entries on page {current_page}.")
-                    for entry_element in page_entries:
-                        entry = self.parse_entry(entry_element)
-                        if entry:
+            pages = range(1, last_page + 1)
+            # every entry of this scrape shares one scrape time
+            now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            # HTML parsing is CPU-bound, so larger scrapes parse in separate processes to get around the GIL
+            parse_pool = None
+            if last_page >= PROCESS_PARSE_MIN_PAGES:
+                parse_pool = ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, last_page),
+                                                 mp_context=PARSE_MP_CONTEXT)
+            # updated copy of the cache; records are replaced, never changed in place
+            http_cache = dict(self._http_cache)
+            cache_changed = False
+            try:
+                # Fetch and parse pages concurrently; map() yields results in page order (first to last page)
+                # while later pages are still downloading, so no raw HTML piles up and each page is
+                # written to the interrupted file as soon as the pages before it are done
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, last_page)) as executor:
+                    results = executor.map(lambda page: self.fetch_and_parse(page, now_str, parse_pool), pages)
+                    for current_page, (parsed, validators, got_body) in zip(pages, results):
+                        if parsed is None:
+                            # 304: the page is unchanged, reuse the entries saved from it last time
+                            cached_ids = self._http_cache[str(current_page)]['ids']
+                            parsed = [replace(self.entry_lookup(entry_id), scraped_at=now_str) for entry_id in cached_ids]
+                        else:
+                            if got_body and not parsed:
+                                print(f"No entries with data-id found on page {current_page}.")
+                            elif parsed:
+                                print(f"Found {len(parsed)} entries on page {current_page}.")
+                            if validators and (validators['etag'] or validators['last_modified']):
+                                cached = dict(validators, ids=[entry.id for entry in parsed])
+                                if http_cache.get(str(current_page)) != cached:
+                                    http_cache[str(current_page)] = cached
+                                    cache_changed = True
+                            elif http_cache.pop(str(current_page), None) is not None:
+                                cache_changed = True
+                        for entry in parsed:
                             entries.append(entry)
                             self.append_to_interrupted(entry)
-                except requests.exceptions.RequestException as e:
-                    print(f"HTTP Request error for page {current_page}: {e}")
-                    continue
-                except Exception as e:
-                    print(f"An error occurred processing page {current_page}: {e}")
-                    continue
+                        if self._interrupted_fh is not None:
+                            # flushed per page so an interrupted run keeps every finished page
+                            self._interrupted_fh.flush()
+            finally:
+                if parse_pool is not None:
+                    parse_pool.shutdown()
+            if self.http_cache_file:
+                for page_key in [key for key in http_cache if int(key) > last_page]:
+                    del http_cache[page_key]
+                    cache_changed = True
+                # most polls see the same validators on every page, so there is nothing to write
+                self._pending_http_cache = http_cache if cache_changed else None
             print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Scrape job finished. {len(entries)} entries scraped.")
         except requests.exceptions.RequestException as e:
             print(f"HTTP Request error during initial page load: {e}")
         except Exception as e:
             print(f"An unexpected error occurred during scraping setup: {e}")
+        finally:
+            if self._interrupted_fh is not None:
+                self._interrupted_fh.close()
+                self._interrupted_fh = None
         return entries 
\ No newline at end of file
@@ -1,6 +1,7 @@
 import unittest
 import os
 import json
+from unittest.mock import patch
 from data_manager import DataManager
 from entry import Entry
 from datetime import datetime
@@ -13,7 +14,7 @@ class TestDataManager(unittest.TestCase):
         
         # Create test entries
         self.entry1 = Entry(
-            id="1",
+            id=1,
             author="test_user",
             timestamp="2024-03-20 12:00:00",
             content="First entry. Second sentence.",
@@ -21,7 +22,7 @@ class TestDataManager(unittest.TestCase):
         )
         
         self.entry2 = Entry(
-            id="2",
+            id=2,
             author="test_user",
             timestamp="2024-03-20 12:01:00",
             content="Second entry. Another sentence.",
@@ -34,6 +35,8 @@ class TestDataManager(unittest.TestCase):
             os.remove(self.test_output_file)
         if os.path.exists(self.test_diff_file):
             os.remove(self.test_diff_file)
+        if os.path.exists(self.data_manager.journal_file):
+            os.remove(self.data_manager.journal_file)
 
     def test_save_and_load_data(self):
         # Test saving data
@@ -46,12 +49,38 @@ class TestDataManager(unittest.TestCase):
         self.assertEqual(loaded_data[0].id, self.entry1.id)
         self.assertEqual(loaded_data[1].id, self.entry2.id)
 
+    def test_save_and_load_binary_data(self):
+        binary_file = "test_output.msgpack.zst"
+        self.addCleanup(lambda: os.path.exists(binary_file) and os.remove(binary_file))
+        data_manager = DataManager(binary_file, self.test_diff_file)
+        data_manager.save_data([self.entry1, self.entry2])
+        loaded = DataManager(binary_file, self.test_diff_file).load_data()
+        self.assertEqual(loaded, [self.entry1, self.entry2])
+        self.assertEqual(loaded[0].content_hash, self.entry1.content_hash)
+
+    def test_failed_binary_save_keeps_previous_state(self):
+        binary_file = "test_output.msgpack.zst"
+        self.addCleanup(lambda: os.path.exists(binary_file) and os.remove(binary_file))
+        data_manager = DataManager(binary_file, self.test_diff_file)
+        data_manager.save_data([self.entry1])
+        with patch('data_manager.zstd.ZstdCompressor', side_effect=OSError("No space left on device")):
+            data_manager.save_data([self.entry1, self.entry2])
+        self.assertFalse(os.path.exists(binary_file + '.tmp'))
+        self.assertEqual(DataManager(binary_file, self.test_diff_file).load_data(), [self.entry1])
+
+    def test_load_index(self):
+        # Entries are keyed by id in file order
+        self.data_manager.save_data([self.entry1, self.entry2])
+        index = self.data_manager.load_index()
+        self.assertEqual(list(index), [self.entry1.id, self.entry2.id])
+        self.assertEqual(index[self.entry2.id], self.entry2)
+
     def test_diff_new_entry(self):
         # Test diff with new entry
-        old_data = [self.entry1]
+        self.data_manager.save_data([self.entry1])
         new_data = [self.entry1, self.entry2]
         
-        diffs = self.data_manager.diff(old_data, new_data)
+        diffs = self.data_manager.diff(new_data)
         self.assertEqual(len(diffs), 1)
         self.assertEqual(diffs[0]['type'], 'new')
         self.assertEqual(diffs[0]['id'], self.entry2.id)
@@ -67,15 +96,26 @@ class TestDataManager(unittest.TestCase):
         )
         
         # Test diff with edited entry
-        old_data = [self.entry1]
+        self.data_manager.save_data([self.entry1])
         new_data = [modified_entry]
         
-        diffs = self.data_manager.diff(old_data, new_data)
+        diffs = self.data_manager.diff(new_data)
         self.assertEqual(len(diffs), 1)
         self.assertEqual(diffs[0]['type'], 'appended')
         self.assertEqual(diffs[0]['id'], self.entry1.id)
         self.assertEqual(diffs[0]['content'], " New content.")
 
+    def test_diff_ignores_whitespace_append(self):
+        modified_entry = Entry(
+            id=self.entry1.id,
+            author=self.entry1.author,
+            timestamp=self.entry1.timestamp,
+            content=self.entry1.content + " \n",
+            scraped_at=self.entry1.scraped_at
+        )
+        self.data_manager.save_data([self.entry1])
+        self.assertEqual(self.data_manager.diff([modified_entry]), [])
+
     def test_diff_completely_edited_entry(self):
         # Create completely modified version of entry1
         modified_entry = Entry(
@@ -87,15 +127,82 @@ class TestDataManager(unittest.TestCase):
         )
         
         # Test diff with completely edited entry
-        old_data = [self.entry1]
+        self.data_manager.save_data([self.entry1])
         new_data = [modified_entry]
         
-        diffs = self.data_manager.diff(old_data, new_data)
+        diffs = self.data_manager.diff(new_data)
         self.assertEqual(len(diffs), 1)
         self.assertEqual(diffs[0]['type'], 'edited')
         self.assertEqual(diffs[0]['id'], self.entry1.id)
         self.assertEqual(diffs[0]['content'], "Completely different content.")
 
+    def test_diff_uses_last_saved_entries(self):
+        # The index follows save_data, so deleted entries are dropped and a later diff sees them as new
+        self.data_manager.save_data([self.entry1, self.entry2])
+        self.data_manager.save_data([self.entry2])
+        diffs = self.data_manager.diff([self.entry1, self.entry2])
+        self.assertEqual([d['id'] for d in diffs], [self.entry1.id])
+        self.assertEqual(diffs[0]['type'], 'new')
+
+    def test_index_keeps_every_saved_entry(self):
+        # Nothing may drop out of the index: diff would report it as new and compact would delete it from disk
+        entries = [Entry(i, "test_user", "2024-03-20 12:00:00", f"Entry {i}.", "2024-03-20 12:00:00") for i in range(1, 6)]
+        self.data_manager.save_data(entries)
+        self.assertEqual(self.data_manager.diff(entries), [])
+        self.data_manager.append_new(entries)
+        self.assertFalse(os.path.exists(self.data_manager.journal_file))
+        self.data_manager.compact()
+        self.assertEqual(DataManager(self.test_output_file, self.test_diff_file).load_data(), entries)
+
+    def test_index_loaded_from_disk_on_start(self):
+        self.data_manager.save_data([self.entry1])
+        data_manager = DataManager(self.test_output_file, self.test_diff_file)
+        self.assertEqual(data_manager.diff([self.entry1]), [])
+
+    def test_load_without_content_hash(self):
+        # Files saved before content_hash existed get it computed on load
+        with open(self.test_output_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'id': '1', 'author': 'test_user', 'timestamp': self.entry1.timestamp,
+                                'content': self.entry1.content, 'scraped_at': self.entry1.scraped_at}) + '\n')
+        data_manager = DataManager(self.test_output_file, self.test_diff_file)
+        loaded = data_manager.load_index()[1]
+        self.assertEqual(loaded.content_hash, self.entry1.content_hash)
+        self.assertEqual(loaded.content_len, len(self.entry1.content))
+        self.assertEqual(data_manager.diff([self.entry1]), [])
+
+    def test_append_new_journals_only_changes(self):
+        self.data_manager.save_data([self.entry1, self.entry2])
+        edited = Entry(self.entry1.id, self.entry1.author, self.entry1.timestamp,
+                       self.entry1.content + " More.", self.entry1.scraped_at)
+        self.data_manager.append_new([edited])
+
+        with open(self.data_manager.journal_file, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([(r['_op'], r['id']) for r in records], [('del', self.entry2.id), ('edit', self.entry1.id)])
+
+        # A fresh manager replays the journal on top of the state file
+        loaded = DataManager(self.test_output_file, self.test_diff_file).load_data()
+        self.assertEqual(loaded, [edited])
+
+    def test_torn_journal_line_skips_only_that_line(self):
+        self.data_manager.save_data([self.entry1])
+        entry3 = Entry(3, "test_user", "2024-03-20 12:02:00", "Third entry.", self.entry1.scraped_at)
+        with open(self.data_manager.journal_file, 'wb') as f:
+            # a crash cut the first record short and the next append continued on the same line
+            f.write(b'{"_op":"new","id":2,"auth' + json.dumps(dict(
+                id=2, author=self.entry2.author, timestamp=self.entry2.timestamp, content=self.entry2.content,
+                scraped_at=self.entry2.scraped_at, _op='new')).encode() + b'\n')
+            f.write(json.dumps(dict(id=3, author=entry3.author, timestamp=entry3.timestamp, content=entry3.content,
+                                    scraped_at=entry3.scraped_at, _op='new')).encode() + b'\n')
+        loaded = DataManager(self.test_output_file, self.test_diff_file).load_data()
+        self.assertEqual(loaded, [self.entry1, entry3])
+
+    def test_compact_folds_journal_into_state(self):
+        self.data_manager.append_new([self.entry1, self.entry2])
+        self.data_manager.compact()
+        self.assertFalse(os.path.exists(self.data_manager.journal_file))
+        self.assertEqual(DataManager(self.test_output_file, self.test_diff_file).load_data(), [self.entry1, self.entry2])
+
     def test_save_diff(self):
         # Create some diffs
         diffs = [
@@ -1,14 +1,17 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from bs4 import BeautifulSoup
+from lxml import html as lxml_html
 from datetime import datetime
 import sys
 import os
+import json
+import tempfile
+import time
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from scraper_module import EksiScraper
+from scraper_module import EksiScraper, parse_entries_fast, _parse_page_bytes
 from entry import Entry
 
 class TestEksiScraper(unittest.TestCase):
@@ -17,24 +20,24 @@ class TestEksiScraper(unittest.TestCase):
         self.scraper = EksiScraper(self.base_url)
 
     def test_get_page_count_with_valid_pager(self):
-        # Create a mock BeautifulSoup object with a valid pager
+        # Create a parsed document with a valid pager
         html = '<div class="pager" data-pagecount="5"></div>'
-        soup = BeautifulSoup(html, 'html.parser')
-        page_count = self.scraper.get_page_count(soup)
+        tree = lxml_html.fromstring(html)
+        page_count = self.scraper.get_page_count(tree)
         self.assertEqual(page_count, 5)
 
     def test_get_page_count_without_pager(self):
-        # Create a mock BeautifulSoup object without a pager
+        # Create a parsed document without a pager
         html = '<div>No pager here</div>'
-        soup = BeautifulSoup(html, 'html.parser')
-        page_count = self.scraper.get_page_count(soup)
+        tree = lxml_html.fromstring(html)
+        page_count = self.scraper.get_page_count(tree)
         self.assertEqual(page_count, 1)
 
     def test_get_page_count_with_invalid_data(self):
-        # Create a mock BeautifulSoup object with invalid page count
+        # Create a parsed document with invalid page count
         html = '<div class="pager" data-pagecount="invalid"></div>'
-        soup = BeautifulSoup(html, 'html.parser')
-        page_count = self.scraper.get_page_count(soup)
+        tree = lxml_html.fromstring(html)
+        page_count = self.scraper.get_page_count(tree)
         self.assertEqual(page_count, 1)
 
     def test_parse_entry_with_valid_data(self):
@@ -45,83 +48,264 @@ class TestEksiScraper(unittest.TestCase):
             <a class="entry-date">20.03.2024 12:00</a>
         </li>
         '''
-        entry_element = BeautifulSoup(html, 'html.parser').find('li')
-        entry = self.scraper.parse_entry(entry_element)
+        entry_element = lxml_html.fromstring(html).xpath('//li')[0]
+        entry = self.scraper.parse_entry(entry_element, "2024-03-20 12:05:00")
         
         self.assertIsNotNone(entry)
-        self.assertEqual(entry.id, "123")
+        self.assertEqual(entry.id, 123)
         self.assertEqual(entry.author, "test_user")
         self.assertEqual(entry.content, "Test content")
         self.assertEqual(entry.timestamp, "20.03.2024 12:00")
-        self.assertIsNotNone(entry.scraped_at)
+        self.assertEqual(entry.scraped_at, "2024-03-20 12:05:00")
 
     def test_parse_entry_with_missing_data(self):
         # Create a mock entry element with missing data
         html = '<li data-id="123"></li>'
-        entry_element = BeautifulSoup(html, 'html.parser').find('li')
-        entry = self.scraper.parse_entry(entry_element)
+        entry_element = lxml_html.fromstring(html).xpath('//li')[0]
+        entry = self.scraper.parse_entry(entry_element, "2024-03-20 12:05:00")
         
         self.assertIsNotNone(entry)
-        self.assertEqual(entry.id, "123")
+        self.assertEqual(entry.id, 123)
         self.assertEqual(entry.author, "N/A")
         self.assertEqual(entry.content, "N/A")
         self.assertEqual(entry.timestamp, "N/A")
-        self.assertIsNotNone(entry.scraped_at)
+        self.assertEqual(entry.scraped_at, "2024-03-20 12:05:00")
 
     def test_parse_entry_without_id(self):
         # Create a mock entry element without an ID
         html = '<li>No ID here</li>'
-        entry_element = BeautifulSoup(html, 'html.parser').find('li')
-        entry = self.scraper.parse_entry(entry_element)
+        entry_element = lxml_html.fromstring(html).xpath('//li')[0]
+        entry = self.scraper.parse_entry(entry_element, "2024-03-20 12:05:00")
         self.assertIsNone(entry)
 
+    def test_parse_entry_joins_content_lines(self):
+        # Text split by markup is joined line by line, as get_text(separator='\n', strip=True) did
+        html = '''
+        <li data-id="7" data-author="test_user">
+            <div class="content"> first line<br>second <a href="#">link</a></div>
+            <a class="entry-date permalink">20.03.2024 12:00</a>
+        </li>
+        '''
+        entry_element = lxml_html.fromstring(html).xpath('//li')[0]
+        entry = self.scraper.parse_entry(entry_element, "2024-03-20 12:05:00")
+        self.assertEqual(entry.content, "first line\nsecond\nlink")
+        self.assertEqual(entry.timestamp, "20.03.2024 12:00")
+
+    def test_parse_entries_fast_matches_dom(self):
+        # The regex fast path must produce what the lxml path produces
+        html = '''
+        <ul id="entry-item-list">
+            <li data-id="1" data-author="user &amp; co" class="entry">
+                <div class="content"> first &quot;line&quot;<br>second <a href="#">link</a> </div>
+                <footer><a class="entry-date permalink" href="/entry/1">20.03.2024 12:00 ~ 12:05</a></footer>
+            </li>
+            <li data-id="2" data-author="user2">
+                <div class="content">café&nbsp;</div>
+                <a class="entry-date">21.03.2024 08:00</a>
+            </li>
+        </ul>
+        '''
+        fast = parse_entries_fast(html, "2024-03-20 12:05:00")
+        tree = lxml_html.fromstring(html)
+        dom = [self.scraper.parse_entry(li, "2024-03-20 12:05:00") for li in tree.xpath('//li')]
+        self.assertEqual(fast, dom)
+        self.assertEqual(fast[0].author, "user & co")
+        self.assertEqual(fast[0].content, 'first "line"\nsecond\nlink')
+
+    def test_parse_page_falls_back_to_dom(self):
+        # Entries without a date link don't fit the regexes and go through lxml instead
+        html = '<ul id="entry-item-list"><li data-id="1"><div class="content">Content 1</div></li></ul>'
+        self.assertIsNone(parse_entries_fast(html, "2024-03-20 12:05:00"))
+        entries = _parse_page_bytes(html.encode('utf-8'), "2024-03-20 12:05:00")
+        self.assertEqual([(entry.id, entry.timestamp) for entry in entries], [(1, "N/A")])
+
     @patch('builtins.open', new_callable=MagicMock)
     def test_append_to_interrupted(self, mock_open):
         # Test appending to interrupted file
         scraper = EksiScraper(self.base_url, interrupted_file="test.jsonl")
         entry = Entry(
-            id="123",
+            id=123,
             author="test_user",
             timestamp="20.03.2024 12:00",
             content="Test content",
             scraped_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         )
-        self.scraper.append_to_interrupted(entry)
+        scraper.append_to_interrupted(entry)
         mock_open.assert_called_once()
 
-    @patch('requests.get')
-    def test_scrape_successful(self, mock_get):
-        # Mock successful response with multiple pages
+    @patch('requests.Session.get')
+    def test_scrape_writes_interrupted_file_once(self, mock_get):
+        # All entries go through one file handle opened for the scrape
         mock_response = MagicMock()
         mock_response.text = '''
-        <div class="pager" data-pagecount="2"></div>
         <ul id="entry-item-list">
-            <li data-id="1" data-author="user1">
-                <div class="content">Content 1</div>
-                <a class="entry-date">20.03.2024 12:00</a>
-            </li>
+            <li data-id="1" data-author="user1"><div class="content">Content 1</div></li>
+            <li data-id="2" data-author="user2"><div class="content">Content 2</div></li>
         </ul>
         '''
+        mock_response.content = mock_response.text.encode('utf-8')
         mock_get.return_value = mock_response
 
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "interrupted.jsonl")
+            scraper = EksiScraper(self.base_url, interrupted_file=path)
+            with patch('builtins.open', wraps=open) as mock_open:
+                entries = scraper.scrape()
+            mock_open.assert_called_once()
+            with open(path, encoding='utf-8') as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(len(entries), 2)
+        self.assertEqual([line["id"] for line in lines], [1, 2])
+
+    @patch('requests.Session.get')
+    def test_scrape_successful(self, mock_get):
+        # Mock successful responses with multiple pages, one entry per page
+        def page_response(url, **kwargs):
+            page = url.rsplit('=', 1)[-1] if '?p=' in url else '1'
+            response = MagicMock()
+            response.text = f'''
+            <div class="pager" data-pagecount="2"></div>
+            <ul id="entry-item-list">
+                <li data-id="{page}" data-author="user{page}">
+                    <div class="content">Content {page}</div>
+                    <a class="entry-date">20.03.2024 12:00</a>
+                </li>
+            </ul>
+            '''
+            response.content = response.text.encode('utf-8')
+            return response
+        mock_get.side_effect = page_response
+
         entries = self.scraper.scrape()
-        self.assertEqual(len(entries), 1)
-        self.assertEqual(entries[0].id, "1")
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0].id, 1)
         self.assertEqual(entries[0].author, "user1")
         self.assertEqual(entries[0].content, "Content 1")
+        self.assertEqual(entries[1].id, 2)
+        self.assertEqual(entries[1].author, "user2")
+        self.assertEqual(entries[1].content, "Content 2")
+
+    @patch('requests.Session.get')
+    def test_scrape_preserves_page_order(self, mock_get):
+        # Pages are fetched concurrently but entries must come back first to last page
+        def page_response(url, **kwargs):
+            page = url.rsplit('=', 1)[-1] if '?p=' in url else '1'
+            response = MagicMock()
+            response.text = f'''
+            <div class="pager" data-pagecount="3"></div>
+            <ul id="entry-item-list">
+                <li data-id="{page}" data-author="user{page}">
+                    <div class="content">Content {page}</div>
+                </li>
+            </ul>
+            '''
+            response.content = response.text.encode('utf-8')
+            return response
+        mock_get.side_effect = page_response
+
+        entries = self.scraper.scrape()
+        self.assertEqual([entry.id for entry in entries], [1, 2, 3])
+
+    @patch('requests.Session.get')
+    def test_scrape_writes_pages_before_later_downloads_finish(self, mock_get):
+        # Pages are parsed and written as they arrive, not after every page has been downloaded
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "interrupted.jsonl")
+            page_one_written = []
+            def page_response(url, **kwargs):
+                page = url.rsplit('=', 1)[-1] if '?p=' in url else '1'
+                if page == '3':
+                    deadline = time.monotonic() + 5
+                    while time.monotonic() < deadline and not page_one_written:
+                        with open(path, encoding='utf-8') as f:
+                            if f.read():
+                                page_one_written.append(True)
+                        time.sleep(0.01)
+                response = MagicMock()
+                response.content = f'''
+                <div class="pager" data-pagecount="3"></div>
+                <ul id="entry-item-list">
+                    <li data-id="{page}" data-author="user{page}"><div class="content">Content {page}</div></li>
+                </ul>
+                '''.encode('utf-8')
+                return response
+            mock_get.side_effect = page_response
+
+            entries = EksiScraper(self.base_url, interrupted_file=path).scrape()
+        self.assertTrue(page_one_written)
+        self.assertEqual([entry.id for entry in entries], [1, 2, 3])
+
+    @patch('requests.Session.get')
+    def test_scrape_skips_page_that_fails_to_parse(self, mock_get):
+        # A blank 200 body makes lxml raise; only that page is lost, not the whole scrape
+        def page_response(url, **kwargs):
+            response = MagicMock()
+            if url.endswith('?p=2'):
+                response.content = b'  '
+            else:
+                response.content = b'''
+                <div class="pager" data-pagecount="2"></div>
+                <ul id="entry-item-list">
+                    <li data-id="1" data-author="user1"><div class="content">Content 1</div></li>
+                </ul>
+                '''
+            return response
+        mock_get.side_effect = page_response
+
+        entries = self.scraper.scrape()
+        self.assertEqual([entry.id for entry in entries], [1])
+
+    @patch('requests.Session.get')
+    def test_scrape_reuses_entries_on_not_modified(self, mock_get):
+        # Pages answered with 304 come back from the HTTP cache of the previous scrape
+        page_html = '''
+        <ul id="entry-item-list">
+            <li data-id="1" data-author="user1"><div class="content">Content 1</div></li>
+        </ul>
+        '''
+        sent_headers = []
+        def page_response(url, headers=None, **kwargs):
+            sent_headers.append(headers)
+            response = MagicMock()
+            if headers.get('If-None-Match') == '"v1"':
+                response.status_code = 304
+                response.content = b''
+            else:
+                response.status_code = 200
+                response.content = page_html.encode('utf-8')
+            response.headers = {'ETag': '"v1"'}
+            return response
+        mock_get.side_effect = page_response
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_file = os.path.join(tmp_dir, "http_cache.json")
+            first_scraper = EksiScraper(self.base_url, http_cache_file=cache_file)
+            first = first_scraper.scrape()
+            # nothing is cached until the caller has saved the entries
+            self.assertFalse(os.path.exists(cache_file))
+            first_scraper.commit_http_cache()
+            # the cache keeps only validators and ids; the entries come from the saved state
+            with open(cache_file, encoding='utf-8') as f:
+                self.assertEqual(json.load(f), {'1': {'etag': '"v1"', 'last_modified': None, 'ids': [1]}})
+            saved = {entry.id: entry for entry in first}
+            second = EksiScraper(self.base_url, http_cache_file=cache_file, entry_lookup=saved.get).scrape()
+        self.assertEqual(sent_headers[-1]['If-None-Match'], '"v1"')
+        self.assertEqual([entry.id for entry in second], [entry.id for entry in first])
+        self.assertEqual(second[0].content, "Content 1")
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_scrape_with_request_error(self, mock_get):
         # Mock request error
         mock_get.side_effect = Exception("Connection error")
         entries = self.scraper.scrape()
         self.assertEqual(len(entries), 0)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_scrape_with_invalid_html(self, mock_get):
         # Mock response with invalid HTML
         mock_response = MagicMock()
         mock_response.text = '<div>Invalid HTML</div>'
+        mock_response.content = mock_response.text.encode('utf-8')
         mock_get.return_value = mock_response
 
         entries = self.scraper.scrape()
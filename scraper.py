@@ -1,171 +1,379 @@
 import requests
-from bs4 import BeautifulSoup
+import lxml.html
+import lxml.etree
 import time
 import schedule
-import json
+import orjson
 import os
 import re # Import regex for timestamp parsing
+from collections import deque
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
 
 BASE_URL = "https://eksisozluk.com/6-subat-2023-deprem-yardimlasma-basligi--7568616"
+PAGE_URL = BASE_URL + "?p={}" # page number goes in the placeholder
 # ID_STORAGE_FILE = "scraped_ids.txt" # Old file
-METADATA_FILE = "entry_metadata.json" # New file for {id: timestamp}
+# METADATA_FILE = "entry_metadata.json" # Old file, rewritten in full every run
+LEGACY_METADATA_FILE = "entry_metadata.json" # Still read once to seed the log below
+METADATA_FILE = "entry_metadata.jsonl" # Append-only log of {"id": ..., "ts": ...}, later lines win
+METADATA_COMPACT_RATIO = 2 # Rewrite the log once it has more than this many lines per unique id
 DATA_OUTPUT_FILE = "scraped_data.jsonl"
+PAGE_VALIDATORS_FILE = "page_validators.json" # {page: {"etag": ..., "last_modified": ...}} for conditional GETs
 CHECK_EDITS_PAGES = 20 # How many recent pages to check for edits hourly
+PAGE_WINDOW = 5 # How many pages are fetched ahead concurrently while scraping backward
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+# One session for every request so the TCP/TLS connection is kept alive between pages and runs
+SESSION = requests.Session()
+SESSION.headers['User-Agent'] = USER_AGENT
+# requests already sends Accept-Encoding: gzip, deflate, plus br when brotli is installed (requirements.txt)
+FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=PAGE_WINDOW) # lives as long as the scheduler loop
+PARSE_WORKERS = 2 # Processes parsing downloaded pages, so parsing overlaps with the fetches and the main loop
+# Workers start on first use, from a fetch thread; a fork server starts them so this process, with other
+# threads mid-request holding sockets and locks, is never forked itself
+PARSE_MP_CONTEXT = multiprocessing.get_context('forkserver')
+PARSE_EXECUTOR = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=PARSE_MP_CONTEXT)
+PARSE_EXECUTOR_LOCK = threading.Lock() # fetch threads replace a broken PARSE_EXECUTOR one at a time
+# Pages are UTF-8; without an explicit encoding lxml assumes latin-1 when there is no meta charset.
+# Used by the scrape loop's thread for the first page and by parse_page in the worker processes,
+# each of which has its own copy.
+HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+TIMESTAMP_RE = re.compile(r"\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}") # DD.MM.YYYY HH:MM, compiled once instead of per entry
 
 # --- Helper Functions ---
 
-def load_metadata():
-    """Loads the entry metadata (id: latest_timestamp) from the JSON file."""
+def has_class(name):
+    """XPath predicate for one class token, the way BeautifulSoup's class_= matches ("entry-date permalink")."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# Compiled once here; tree.xpath("...") would parse and compile the expression on every call
+XP_PAGECOUNT = lxml.etree.XPath(f"//div[{has_class('pager')}]/@data-pagecount")
+XP_ENTRY_LIST = lxml.etree.XPath("//ul[@id='entry-item-list']")
+XP_ENTRIES = lxml.etree.XPath(".//li[@data-id]")
+XP_CONTENT = lxml.etree.XPath(f".//div[{has_class('content')}]")
+XP_DATE = lxml.etree.XPath(f".//a[{has_class('entry-date')}]")
+
+def read_metadata_log():
+    """Replays the metadata log into {id: latest_timestamp}. Returns (metadata, number of log lines)."""
     metadata = {}
+    line_count = 0
+    try:
+        with open(METADATA_FILE, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    print(f"Warning: skipping corrupted line in {METADATA_FILE}.") # e.g. a write cut short
+                    continue
+                metadata[str(record['id'])] = record['ts']
+                line_count += 1
+    except Exception as e:
+        print(f"Error loading metadata from {METADATA_FILE}: {e}")
+    return metadata, line_count
+
+def load_known_ids():
+    """Loads the ids of already scraped entries from the metadata log as a set of ints.
+    Ekşi ids are numeric, and an int set is far smaller than the {id_str: timestamp} dict,
+    which is only rebuilt when the log is compacted. Returns (known_ids, number of log lines)."""
+    known_ids = set()
+    line_count = 0
     if os.path.exists(METADATA_FILE):
         try:
-            with open(METADATA_FILE, 'r', encoding='utf-8') as f:
-                metadata = json.load(f)
-        except json.JSONDecodeError:
-            print(f"Warning: {METADATA_FILE} is corrupted or not valid JSON. Starting fresh.")
+            with open(METADATA_FILE, 'rb') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        print(f"Warning: skipping corrupted line in {METADATA_FILE}.") # e.g. a write cut short
+                        continue
+                    try:
+                        known_ids.add(int(record['id']))
+                    except ValueError:
+                        # a valid record that compaction keeps, so it still counts as a log line
+                        print(f"Warning: ignoring non-numeric id {record['id']!r} in {METADATA_FILE}.")
+                    line_count += 1
         except Exception as e:
             print(f"Error loading metadata from {METADATA_FILE}: {e}")
-    # Ensure loaded keys are strings if they somehow got saved as ints
-    return {str(k): v for k, v in metadata.items()} 
+    elif os.path.exists(LEGACY_METADATA_FILE):
+        metadata = {}
+        try:
+            with open(LEGACY_METADATA_FILE, 'rb') as f:
+                metadata = orjson.loads(f.read())
+        except orjson.JSONDecodeError:
+            print(f"Warning: {LEGACY_METADATA_FILE} is corrupted or not valid JSON. Starting fresh.")
+        except Exception as e:
+            print(f"Error loading metadata from {LEGACY_METADATA_FILE}: {e}")
+        # Ensure loaded keys are strings if they somehow got saved as ints
+        metadata = {str(k): v for k, v in metadata.items()}
+        if metadata:
+            save_metadata(metadata) # Move the old file's contents into the log once
+            known_ids = {int(k) for k in metadata if k.isdigit()}
+            line_count = len(metadata)
+    return known_ids, line_count
 
 def save_metadata(metadata):
-    """Saves the entry metadata (id: latest_timestamp) to the JSON file."""
+    """Rewrites the metadata log with one line per id (compaction)."""
+    temp_file = METADATA_FILE + '.tmp'
+    try:
+        with open(temp_file, 'wb') as f:
+            f.write(b''.join(orjson.dumps({"id": k, "ts": v}) + b'\n' for k, v in metadata.items()))
+        os.replace(temp_file, METADATA_FILE) # never leaves a half-written log behind
+    except Exception as e:
+        print(f"Error saving metadata to {METADATA_FILE}: {e}")
+
+def compact_metadata():
+    """Rewrites the metadata log with only the latest line per id."""
+    metadata, _ = read_metadata_log()
+    save_metadata(metadata)
+
+def save_metadata_updates(updates):
+    """Appends only the new/changed ids to the metadata log."""
     try:
-        with open(METADATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, ensure_ascii=False, indent=4) # Use indent for readability
+        with open(METADATA_FILE, 'ab') as f:
+            f.write(b''.join(orjson.dumps({"id": k, "ts": v}) + b'\n' for k, v in updates.items()))
     except Exception as e:
         print(f"Error saving metadata to {METADATA_FILE}: {e}")
 
+def load_page_validators():
+    """Loads the ETag/Last-Modified seen for each page on the last run."""
+    if os.path.exists(PAGE_VALIDATORS_FILE):
+        try:
+            with open(PAGE_VALIDATORS_FILE, 'rb') as f:
+                return orjson.loads(f.read())
+        except Exception as e:
+            print(f"Error loading page validators from {PAGE_VALIDATORS_FILE}: {e}")
+    return {}
+
+def save_page_validators(page_validators):
+    """Saves the per-page ETag/Last-Modified map."""
+    try:
+        with open(PAGE_VALIDATORS_FILE, 'wb') as f:
+            f.write(orjson.dumps(page_validators))
+    except Exception as e:
+        print(f"Error saving page validators to {PAGE_VALIDATORS_FILE}: {e}")
+
 def parse_latest_timestamp(timestamp_str):
     """Extracts the latest timestamp (edit time if available) from the string."""
     if not timestamp_str:
         return None
     # Format is like 'DD.MM.YYYY HH:MM' or 'DD.MM.YYYY HH:MM ~ DD.MM.YYYY HH:MM'
-    parts = timestamp_str.split('~')
-    latest_part = parts[-1].strip() # Get the part after '~' or the only part
-    
+    if '~' not in timestamp_str:
+        return timestamp_str # Never edited, the common case; the format is fixed
+    latest_part = timestamp_str.rsplit('~', 1)[1].strip() # Get the part after '~'
+
     # Basic validation regex (DD.MM.YYYY HH:MM)
-    if re.match(r"\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}", latest_part):
+    if TIMESTAMP_RE.match(latest_part):
         return latest_part
     else:
         # print(f"Warning: Could not parse timestamp: {timestamp_str}") # Optional warning
         return timestamp_str # Return original if parsing fails, better than None
 
 
-def append_data(data, is_update=False):
-    """Appends newly scraped data to the output file, optionally marking updates."""
+def append_data(data, data_file, is_update=False):
+    """Appends newly scraped data to the open output file, optionally marking updates."""
     try:
-        with open(DATA_OUTPUT_FILE, 'a', encoding='utf-8') as f:
-            if is_update:
-                data['update_reason'] = 'edit' # Mark that this is an update due to edit
-            else:
-                 data.pop('update_reason', None) # Remove field if it existed and is not an update
-            json.dump(data, f, ensure_ascii=False)
-            f.write('\n')
+        if is_update:
+            data['update_reason'] = 'edit' # Mark that this is an update due to edit
+        else:
+             data.pop('update_reason', None) # Remove field if it existed and is not an update
+        data_file.write(orjson.dumps(data) + b'\n')
     except Exception as e:
         print(f"Error appending data: {e}")
 
 
+def element_text(element, separator=''):
+    """Joins the element's stripped, non-empty text pieces (same result as BeautifulSoup's get_text(separator, strip=True))."""
+    return separator.join(text for text in (piece.strip() for piece in element.itertext()) if text)
+
+
+def parse_page(html_bytes):
+    """Extracts the entries of a topic page as dicts (id, author, content, timestamp as shown).
+    Returns None if the page has no entry list. Pure, so it can run in PARSE_EXECUTOR."""
+    tree = lxml.html.fromstring(html_bytes, parser=HTML_PARSER)
+    entry_lists = XP_ENTRY_LIST(tree)
+    if not entry_lists:
+        return None
+    entries = []
+    for entry in XP_ENTRIES(entry_lists[0]):
+        content_divs = XP_CONTENT(entry)
+        # author_div = entry.find('a', class_='entry-author') # Use data-author instead
+        date_divs = XP_DATE(entry)
+        entries.append({
+            'id': entry.get('data-id'),
+            'author': entry.get('data-author', "N/A"), # Use data-author attribute
+            # separator is a literal backslash-n, as in every line already in DATA_OUTPUT_FILE
+            'content': element_text(content_divs[0], separator='\\n') if content_divs else "N/A",
+            'timestamp': element_text(date_divs[0]) if date_divs else "N/A",
+        })
+    return entries
+
+
+def parse_in_worker(html_bytes):
+    """Runs parse_page in PARSE_EXECUTOR. If a worker died (OOM kill, segfault) the pool is broken for good,
+    so it is replaced and the page parsed once more; otherwise every later run would fail on its first page."""
+    global PARSE_EXECUTOR
+    executor = PARSE_EXECUTOR
+    try:
+        return executor.submit(parse_page, html_bytes).result()
+    except BrokenProcessPool:
+        with PARSE_EXECUTOR_LOCK:
+            if PARSE_EXECUTOR is executor: # another fetch thread may have replaced it already
+                print("Parse worker died, restarting the parse pool.")
+                PARSE_EXECUTOR = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=PARSE_MP_CONTEXT)
+                executor.shutdown(wait=False)
+        return PARSE_EXECUTOR.submit(parse_page, html_bytes).result()
+
+
+def fetch_page(page_number, validators=None):
+    """Downloads and parses one topic page (runs on FETCH_EXECUTOR); errors surface from future.result().
+    The fetch thread waits for the parse process, so the next downloads keep going meanwhile.
+    Returns (not_modified, entries, validators); a 304 answer to the conditional GET has no entries."""
+    headers = {}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    response = SESSION.get(PAGE_URL.format(page_number), headers=headers, timeout=20)
+    if response.status_code == 304:
+        return True, None, validators
+    response.raise_for_status()
+    new_validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+    return False, parse_in_worker(response.content), new_validators
+
+
+def fetch_pages_backward(last_page, page_validators):
+    """Yields (page_number, future) from last_page down to 1 with up to PAGE_WINDOW fetches in flight.
+    Fetches that haven't started are cancelled when the caller stops iterating."""
+    page_numbers = iter(range(last_page, 0, -1))
+    def submit(page):
+        return FETCH_EXECUTOR.submit(fetch_page, page, page_validators.get(str(page)))
+    window = deque((page, submit(page)) for page in islice(page_numbers, PAGE_WINDOW))
+    try:
+        while window:
+            current_page, future = window.popleft()
+            next_page = next(page_numbers, None)
+            if next_page is not None:
+                window.append((next_page, submit(next_page)))
+            yield current_page, future
+    finally:
+        for _, future in window:
+            future.cancel()
+
+
 def scrape_eksi():
     """Scrapes the target Ekşi Sözlük pages backward for new entries."""
     print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Starting scrape job...")
-    metadata = load_metadata()
-    initial_entry_count = len(metadata)
+    known_ids, metadata_log_lines = load_known_ids() # ids only, for the per-entry "already scraped?" check
+    page_validators = load_page_validators()
+    run_page_validators = {} # pages fully processed this run; saved only after their ids are
+    initial_entry_count = len(known_ids)
     new_entries_found_total = 0
     
     # Keep track of new ids added in this run to update metadata correctly
     current_run_metadata_updates = {} 
+    data_file = None # DATA_OUTPUT_FILE, opened once per run instead of once per entry
 
     try:
         # 1. Get the main page to find the last page number
-        headers = {'User-Agent': USER_AGENT}
         print(f"Fetching base URL to find page count: {BASE_URL}")
-        response = requests.get(BASE_URL, headers=headers, timeout=20)
+        response = SESSION.get(BASE_URL, timeout=20)
         response.raise_for_status() # raise an exception for bad status codes
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+        tree = lxml.html.fromstring(response.content, parser=HTML_PARSER)
 
         # find the pager and get the last page number
-        pager = soup.find('div', class_='pager') # pager is the pagination bar
-        if not pager or 'data-pagecount' not in pager.attrs:
+        page_counts = XP_PAGECOUNT(tree) # pager is the pagination bar
+        if not page_counts:
             print("Could not find pager or page count. Scraping only first page.")
             last_page = 1
         else:
             try:
-                last_page = int(pager['data-pagecount'])
+                last_page = int(page_counts[0])
                 print(f"Found {last_page} pages.")
             except ValueError:
                 print("Could not parse page count. Scraping only first page.")
                 last_page = 1
 
-        # 2. scrape pages backward from last_page
-        for current_page in range(last_page, 0, -1):
-            target_url = f"{BASE_URL}?p={current_page}"
+        data_file = open(DATA_OUTPUT_FILE, 'ab')
+        scraped_at = time.strftime('%Y-%m-%d %H:%M:%S') # one stamp for every entry of this run
+
+        # 2. scrape pages backward from last_page (pages are fetched ahead concurrently, processed in order)
+        for current_page, page_future in fetch_pages_backward(last_page, page_validators):
+            target_url = PAGE_URL.format(current_page)
             print(f"Scraping page {current_page}: {target_url}")
             stop_scraping_previous_pages = False
             new_entries_on_this_page = 0
 
             try:
-                response_page = requests.get(target_url, headers=headers, timeout=20)
-                response_page.raise_for_status()
-                soup_page = BeautifulSoup(response_page.text, 'html.parser')
-
-                entry_list = soup_page.find('ul', id='entry-item-list')
-                if not entry_list:
+                not_modified, entries, validators = page_future.result()
+                if not_modified:
+                    # Unchanged since a run that processed it, so every entry on it is already known
+                    print(f"  Page {current_page} not modified since the last run. Stopping backward scrape.")
+                    break
+                if entries is None:
                     print(f"Could not find entry list on page {current_page}.")
                     continue # try the previous page
 
-                entries = entry_list.find_all('li', attrs={'data-id': True})
                 if not entries:
                     print(f"No entries with data-id found on page {current_page}.")
                     continue # try the previous page
 
                 print(f"Found {len(entries)} entries on page {current_page}.")
 
+                # Everything from the first known id on is old: find the cutoff with set lookups over the ids
+                # and only process the entries before it
+                page_ids = [int(entry['id']) if entry['id'].isdigit() else entry['id'] for entry in entries]
+                cutoff = next((i for i, entry_id in enumerate(page_ids) if entry_id in known_ids), len(page_ids))
+                stop_scraping_previous_pages = cutoff < len(page_ids)
+
                 # process entries on the current page
-                for entry in entries:
-                    entry_id = entry.get('data-id')
+                for position, entry in enumerate(islice(entries, cutoff)):
+                    entry_id = entry['id']
                     if not entry_id:
                         continue # skip if no ID
 
-                    if entry_id in metadata:
-                        # Found an entry we already scraped, stop going to previous pages
-                        print(f"  Found known entry ID {entry_id} on page {current_page}. Stopping backward scrape.")
-                        stop_scraping_previous_pages = True
-                        break # Stop processing entries on this page
-                    else:
-                        # New entry found, process it
-                        content_div = entry.find('div', class_='content')
-                        # author_div = entry.find('a', class_='entry-author') # Use data-author instead
-                        date_div = entry.find('a', class_='entry-date')
-
-                        content = content_div.get_text(separator='\\n', strip=True) if content_div else "N/A"
-                        author = entry.get('data-author', "N/A") # Use data-author attribute
-                        timestamp = date_div.get_text(strip=True) if date_div else "N/A"
-
-                        # Basic cleaning/extraction from timestamp
-                        latest_timestamp = parse_latest_timestamp(timestamp)
-                        if latest_timestamp is None:
-                            print(f"  Warning: Skipping entry {entry_id} due to unparsable timestamp: {timestamp}")
-                            continue
-
-                        entry_data = {
-                            'id': entry_id,
-                            'author': author,
-                            'timestamp': latest_timestamp, # Store the parsed latest timestamp
-                            'content': content,
-                            'scraped_at': time.strftime('%Y-%m-%d %H:%M:%S')
-                        }
-
-                        append_data(entry_data, is_update=False)
-                        current_run_metadata_updates[entry_id] = latest_timestamp # Mark for metadata update
-                        new_entries_on_this_page += 1
-                        # print(f"  New entry added: ID={entry_id}, Author={author}")
+                    # New entry found, process it (fields were extracted by parse_page)
+                    content = entry['content']
+                    author = entry['author']
+                    timestamp = entry['timestamp']
+
+                    # Basic cleaning/extraction from timestamp
+                    latest_timestamp = parse_latest_timestamp(timestamp)
+                    if latest_timestamp is None:
+                        print(f"  Warning: Skipping entry {entry_id} due to unparsable timestamp: {timestamp}")
+                        continue
+
+                    entry_data = {
+                        'id': entry_id,
+                        'author': author,
+                        'timestamp': latest_timestamp, # Store the parsed latest timestamp
+                        'content': content,
+                        'scraped_at': scraped_at
+                    }
+
+                    append_data(entry_data, data_file, is_update=False)
+                    current_run_metadata_updates[entry_id] = latest_timestamp # Mark for metadata update
+                    known_ids.add(page_ids[position])
+                    new_entries_on_this_page += 1
+                    # print(f"  New entry added: ID={entry_id}, Author={author}")
+
+                if stop_scraping_previous_pages:
+                    # Found an entry we already scraped, stop going to previous pages
+                    print(f"  Found known entry ID {page_ids[cutoff]} on page {current_page}. Stopping backward scrape.")
 
                 new_entries_found_total += new_entries_on_this_page
                 if new_entries_on_this_page > 0:
+                     data_file.flush() # a crash later in the run keeps this page's entries
                      print(f"  Added {new_entries_on_this_page} new entries from page {current_page}.")
+                if validators['etag'] or validators['last_modified']:
+                    run_page_validators[str(current_page)] = validators
 
                 # if we found a known entry, stop the outer loop (pages)
                 if stop_scraping_previous_pages:
@@ -180,33 +388,48 @@ def scrape_eksi():
                  # optionally decide whether to stop or continue
                  break # stop on other errors for safety
 
+        # entries must be on disk before their ids are recorded as scraped
+        data_file.close()
+
         # 3. Save metadata if new ones were found
         if current_run_metadata_updates:
             print(f"Finished scraping. Added {new_entries_found_total} new entries in total.")
-            metadata.update(current_run_metadata_updates) # Add new entries to metadata
-            save_metadata(metadata)
+            save_metadata_updates(current_run_metadata_updates)
+            metadata_log_lines += len(current_run_metadata_updates)
+            if metadata_log_lines > METADATA_COMPACT_RATIO * len(known_ids):
+                compact_metadata()
         else:
             print("Finished scraping. No new entries found.")
+        if run_page_validators:
+            page_validators.update(run_page_validators)
+            save_page_validators(page_validators)
 
     except requests.exceptions.RequestException as e:
         print(f"HTTP Request error during initial page load: {e}")
     except Exception as e:
         print(f"An unexpected error occurred during scraping setup: {e}")
     finally:
+        if data_file is not None:
+            data_file.close() # no-op if already closed
         print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Scrape job finished.")
 
 
 # Scheduling (Delete this section if you don't want to schedule the job inside the script)
 
-print("Setting up schedule...")
-# run once immediately
-scrape_eksi()
+# Guarded so parse worker processes that re-import this module (spawn start method) don't start a scheduler
+if __name__ == "__main__":
+    print("Setting up schedule...")
+    # run once immediately
+    scrape_eksi()
 
-# schedule the job every 10 minutes
-schedule.every(10).minutes.do(scrape_eksi)
+    # schedule the job every 10 minutes
+    schedule.every(10).minutes.do(scrape_eksi)
 
-print("Scheduler started. waiting for next run...")
+    print("Scheduler started. waiting for next run...")
 
-while True:
-    schedule.run_pending()
-    time.sleep(1) # wait 1 second between checks 
\ No newline at end of file
+    while True:
+        # sleep straight through to the next due job instead of waking up every second to check
+        idle = schedule.idle_seconds()
+        if idle is not None and idle > 0:
+            time.sleep(idle)
+        schedule.run_pending() 
\ No newline at end of file